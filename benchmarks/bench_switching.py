@@ -0,0 +1,181 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Ten Brush Slots is a Krita plugin for switching brush presets.
+# Copyright (C) 2023  Lucifer <krita-artists.org/u/Lucifer>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Headless latency benchmark for slot switching.
+
+Runs the plugin against the stand-in API in fakekrita.py with generated
+preset and kit libraries, and reports latency percentiles per operation:
+
+    python benchmarks/bench_switching.py
+    python benchmarks/bench_switching.py --presets 1000 --kits 1,50 --repeat 200
+    python benchmarks/bench_switching.py --slots 10,40
+"""
+
+import os
+import sys
+import random
+import argparse
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtWidgets import QApplication
+
+import fakekrita
+
+PRESETS = [1000, 10000, 50000]
+KITS = [1, 50, 500]
+SLOTS = [10]
+REPEAT = 500
+
+
+def generateKits(names: list, count: int, slotCount: int, rng: random.Random):
+    kits = []
+    for index in range(count):
+        # Presets are unique within a kit, as the editor enforces
+        pool = rng.sample(names, min(len(names), slotCount * 4 * 6))
+        slots = []
+        for _ in range(slotCount):
+            slot = []
+            for _ in range(rng.randint(1, 4)):
+                size = rng.randint(1, 6)
+                group, pool = pool[:size], pool[size:]
+                if group:
+                    slot.append(group)
+            slots.append(slot)
+        kits.append({"name": f"Kit {index}", "slots": slots})
+    return kits
+
+
+def percentile(samples: list, fraction: float):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def measure(results: dict, name: str, call, repeat: int, events=False):
+    samples = []
+    deferred = []
+    for _ in range(repeat):
+        start = time.perf_counter_ns()
+        call()
+        samples.append(time.perf_counter_ns() - start)
+        if events:
+            # Work a press leaves to the event loop, like prefetching neighbours and throttled messages
+            start = time.perf_counter_ns()
+            QApplication.processEvents()
+            deferred.append(time.perf_counter_ns() - start)
+    results.setdefault(name, []).extend(samples)
+    if events:
+        results.setdefault(f"{name} deferred", []).extend(deferred)
+
+
+def scenario(presetCount: int, kitCount: int, slotCount: int, repeat: int, seed: int):
+    folder = tempfile.mkdtemp(prefix="tenbrushslots")
+    app = fakekrita.install(folder)
+    from tenbrushslots.tenbrushslots import TenBrushSlots
+    from tenbrushslots.kitstorage import KitStorage
+
+    rng = random.Random(seed)
+    names = [f"Preset {index}" for index in range(presetCount)]
+    app.presets = {name: fakekrita.Resource(name) for name in names}
+    KitStorage().save({"kits": generateKits(names, kitCount, slotCount, rng),
+                       "options": {"slotCount": slotCount}})
+
+    results = {}
+    # Importing the package registered its own instance, use a fresh one per scenario
+    extension = TenBrushSlots(app)
+    app.extensions = [extension]
+    start = time.perf_counter_ns()
+    extension.setup()
+    results["setup"] = [time.perf_counter_ns() - start]
+
+    window = app.openWindow()
+    view = window.activeView()
+    view.preset = app.presets[names[0]]
+    slots = [window.action(f"activate_slot_{number.replace('-', '_')}") for number in extension.slotNames]
+
+    measure(results, "activateSlot", lambda: rng.choice(slots).trigger(), repeat, True)
+    measure(results, "activateSlot 2nd press", lambda: slots[0].trigger(), repeat, True)
+    for order in ["group", "position", "kit"]:
+        action = window.action(f"switch_to_next_{order}")
+        measure(results, f"switchPreset {order}", action.trigger, repeat, True)
+
+    kits = list(extension.kits)
+    state = extension.windows[window.qwindow()]
+
+    def renderMessage():
+        # Presses closer than the throttle only render the last message, time one rendering on its own
+        extension.messages.pending = (view, state.kit, "selected")
+        extension.messages.flush()
+    measure(results, "floating message", renderMessage, repeat)
+    measure(results, "setActiveKit", lambda: extension.setActiveKit(rng.choice(kits), state), repeat)
+
+    def readSettings():
+        reader = TenBrushSlots(app)
+        reader.storage = KitStorage()
+        start = time.perf_counter_ns()
+        reader.readSettings()
+        return time.perf_counter_ns() - start
+    results["readSettings"] = [readSettings() for _ in range(max(1, repeat // 50))]
+
+    def writeSettings():
+        kit = rng.choice(kits)
+        extension.updateKit(kit, [list(slot) for slot in reversed(extension.getKit(kit))])
+        extension.writeSettings()
+    # Time spent on the GUI thread, the file is written by the save queue
+    measure(results, "writeSettings", writeSettings, max(1, repeat // 50))
+    measure(results, "saveQueue.flush", extension.saveQueue.flush, 1)
+
+    app.closeWindow(window)
+    return results
+
+
+def report(presetCount: int, kitCount: int, slotCount: int, results: dict):
+    print(f"\n{presetCount} presets, {kitCount} kits, {slotCount} slots")
+    print(f"{'operation':<36}{'calls':>7}{'p50 us':>11}{'p95 us':>11}{'p99 us':>11}{'max us':>11}")
+    for name, samples in results.items():
+        samples = sorted(samples)
+        row = [percentile(samples, 0.5), percentile(samples, 0.95), percentile(samples, 0.99), samples[-1]]
+        print(f"{name:<36}{len(samples):>7}" + "".join(f"{value / 1000:>11.1f}" for value in row))
+
+
+def numbers(text: str):
+    return [int(value) for value in text.split(",") if value]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark slot switching against a fake Krita API.")
+    parser.add_argument("--presets", type=numbers, default=PRESETS, help="comma separated library sizes")
+    parser.add_argument("--kits", type=numbers, default=KITS, help="comma separated kit counts")
+    parser.add_argument("--slots", type=numbers, default=SLOTS, help="comma separated slot counts")
+    parser.add_argument("--repeat", type=int, default=REPEAT, help="presses measured per operation")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    qapp = QApplication(sys.argv[:1])
+    for presetCount in args.presets:
+        for kitCount in args.kits:
+            for slotCount in args.slots:
+                results = scenario(presetCount, kitCount, slotCount, args.repeat, args.seed)
+                report(presetCount, kitCount, slotCount, results)
+    qapp.quit()
+
+
+if __name__ == "__main__":
+    main()
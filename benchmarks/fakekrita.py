@@ -0,0 +1,263 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Ten Brush Slots is a Krita plugin for switching brush presets.
+# Copyright (C) 2023  Lucifer <krita-artists.org/u/Lucifer>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""Stand-in for the parts of Krita's scripting API used by the plugin.
+
+Actions are real PyQt5 QActions so shortcut handlers can use sender(),
+everything else only keeps enough state for slot switching to behave
+like it does inside Krita. Call install() before importing the plugin.
+"""
+
+import sys
+import builtins
+from PyQt5.QtCore import QObject, pyqtSignal
+from PyQt5.QtGui import QImage, QIcon
+from PyQt5.QtWidgets import QAction, QMainWindow, QDockWidget, QToolButton, QWidget
+
+# Size of generated preset thumbnails, same as Krita's
+THUMBNAIL = 200
+
+
+class Resource:
+
+    def __init__(self, name: str, version=0):
+        self._name = name
+        self._filename = f"{name}.{version:04}.kpp"
+        self._image = QImage(THUMBNAIL, THUMBNAIL, QImage.Format.Format_ARGB32)
+
+    def name(self):
+        return self._name
+
+    def setName(self, name: str):
+        self._name = name
+
+    def filename(self):
+        return self._filename
+
+    def image(self):
+        return self._image
+
+
+class View:
+
+    def __init__(self):
+        self.preset = None
+        self.size = 10.0
+        self.opacity = 1.0
+        self.flow = 1.0
+        self.rotation = 0.0
+        self.blending = "normal"
+        self.messages = 0
+
+    def visible(self):
+        return True
+
+    def currentBrushPreset(self):
+        return self.preset
+
+    def activateResource(self, resource):
+        self.preset = resource
+
+    def brushSize(self):
+        return self.size
+
+    def setBrushSize(self, size):
+        self.size = size
+
+    def paintingOpacity(self):
+        return self.opacity
+
+    def setPaintingOpacity(self, opacity):
+        self.opacity = opacity
+
+    def paintingFlow(self):
+        return self.flow
+
+    def setPaintingFlow(self, flow):
+        self.flow = flow
+
+    def brushRotation(self):
+        return self.rotation
+
+    def setBrushRotation(self, rotation):
+        self.rotation = rotation
+
+    def currentBlendingMode(self):
+        return self.blending
+
+    def setCurrentBlendingMode(self, blending):
+        self.blending = blending
+
+    def showFloatingMessage(self, message, icon, time, priority):
+        self.messages += 1
+
+
+class Window(QObject):
+
+    windowClosed = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self._qwindow = QMainWindow()
+        toolBox = QDockWidget(self._qwindow)
+        toolBox.setObjectName('ToolBox')
+        brushTool = QToolButton(toolBox)
+        brushTool.setObjectName('KritaShape/KisToolBrush')
+        brushTool.setCheckable(True)
+        brushTool.setChecked(True)
+        self._view = View()
+
+    def qwindow(self):
+        return self._qwindow
+
+    def views(self):
+        return [self._view]
+
+    def activeView(self):
+        return self._view
+
+    def createAction(self, id: str, text: str, menuLocation: str):
+        action = QAction(text, self._qwindow)
+        action.setObjectName(id)
+        return action
+
+    def action(self, id: str):
+        return self._qwindow.findChild(QAction, id)
+
+    def close(self):
+        self.windowClosed.emit()
+        self._qwindow.deleteLater()
+
+
+class Notifier(QObject):
+
+    applicationClosing = pyqtSignal()
+    imageClosed = pyqtSignal(str)
+    windowCreated = pyqtSignal()
+
+    def setActive(self, active: bool):
+        pass
+
+
+class Extension(QObject):
+
+    def __init__(self, parent):
+        super().__init__(parent)
+
+    def setup(self):
+        pass
+
+    def createActions(self, window):
+        pass
+
+
+class PresetChooser(QWidget):
+
+    presetClicked = pyqtSignal(object)
+    presetSelected = pyqtSignal(object)
+
+    def currentPreset(self):
+        return None
+
+
+class Krita(QObject):
+
+    _instance = None
+
+    def __init__(self, appDataLocation: str):
+        super().__init__()
+        self.presets = {}
+        self.settings = {}
+        self.appDataLocation = appDataLocation
+        self.extensions = []
+        self.windowList = []
+        self.window = None
+        self.actions = {}
+        self._notifier = Notifier()
+        # Counters for calls that are expensive inside Krita
+        self.resourceCalls = 0
+        self.settingWrites = 0
+
+    @classmethod
+    def instance(cls):
+        return cls._instance
+
+    def resources(self, type: str):
+        # Krita builds a new dict of resource wrappers on every call
+        self.resourceCalls += 1
+        return dict(self.presets)
+
+    def readSetting(self, group: str, name: str, defaultValue: str):
+        return self.settings.get((group, name), defaultValue)
+
+    def writeSetting(self, group: str, name: str, value: str):
+        self.settingWrites += 1
+        self.settings[(group, name)] = value
+
+    def getAppDataLocation(self):
+        return self.appDataLocation
+
+    def notifier(self):
+        return self._notifier
+
+    def windows(self):
+        return list(self.windowList)
+
+    def activeWindow(self):
+        return self.window
+
+    def action(self, name: str):
+        if name not in self.actions:
+            action = QAction()
+            action.setObjectName(name)
+            action.setCheckable(name == 'erase_action')
+            self.actions[name] = action
+        return self.actions[name]
+
+    def icon(self, name: str):
+        return QIcon()
+
+    def addExtension(self, extension):
+        self.extensions.append(extension)
+
+    def openWindow(self):
+        window = Window()
+        self.windowList.append(window)
+        self.window = window
+        for extension in self.extensions:
+            extension.createActions(window)
+        self._notifier.windowCreated.emit()
+        return window
+
+    def closeWindow(self, window: Window):
+        self.windowList.remove(window)
+        if self.window is window:
+            self.window = self.windowList[-1] if self.windowList else None
+        window.close()
+
+
+def install(appDataLocation: str):
+    """Register the stand-in as the krita module and its builtins, return the instance."""
+    Krita._instance = Krita(appDataLocation)
+    module = sys.modules[__name__]
+    sys.modules['krita'] = module
+    builtins.Krita = Krita
+    builtins.Application = Krita._instance
+    if not hasattr(builtins, 'i18n'):
+        builtins.i18n = lambda text: text
+    return Krita._instance
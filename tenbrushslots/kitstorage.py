@@ -0,0 +1,155 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Ten Brush Slots is a Krita plugin for switching brush presets.
+# Copyright (C) 2023  Lucifer <krita-artists.org/u/Lucifer>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import tempfile
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+
+FILE_NAME = "tenbrushslots.json"
+# Bump when the layout of stored data changes, see upgrade
+VERSION = 2
+# Longest wait in seconds for queued saves, so closing Krita never hangs on a stuck write
+FLUSH_TIMEOUT = 10
+
+
+class KitStorage:
+
+    def __init__(self, path=""):
+        self.path = path or os.path.join(Application.getAppDataLocation(), FILE_NAME)
+
+    def exists(self):
+        return os.path.isfile(self.path)
+
+    def load(self):
+        if not self.exists():
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            data = None
+        if type(data) is not dict or type(data.get("kits")) is not list:
+            # Keep unreadable file aside instead of overwriting it on next save
+            os.replace(self.path, self.path + ".bak")
+            return
+        return upgrade(data)
+
+    def save(self, data: dict):
+        data["version"] = VERSION
+        folder = os.path.dirname(self.path)
+        os.makedirs(folder, exist_ok=True)
+
+        # Write beside the target then swap, so a crash never leaves a partial file
+        handle, temp = tempfile.mkstemp(prefix=FILE_NAME, suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as file:
+                json.dump(data, file, ensure_ascii=False, separators=(",", ":"))
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temp, self.path)
+        except Exception:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
+
+
+class SaveQueue(QObject):
+
+    # Emitted from the writing thread, queued to the thread the queue lives in
+    failed = pyqtSignal(str)
+
+    def __init__(self, storage: KitStorage, parent=None):
+        super().__init__(parent)
+        self.storage = storage
+        # Latest snapshot not written yet, later saves replace it
+        self.pending = None
+        self.writing = False
+        self.thread = None
+        self.condition = threading.Condition()
+
+    def save(self, data: dict):
+        with self.condition:
+            self.pending = data
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.write, name="tenbrushslots-save", daemon=True)
+                self.thread.start()
+            self.condition.notify_all()
+
+    def write(self):
+        while True:
+            with self.condition:
+                while self.pending is None:
+                    self.condition.wait()
+                data = self.pending
+                self.pending = None
+                self.writing = True
+            
+            try:
+                self.storage.save(data)
+            except Exception as error:
+                # Any failure is reported, the thread keeps serving later saves
+                self.failed.emit(str(error))
+            finally:
+                with self.condition:
+                    self.writing = False
+                    self.condition.notify_all()
+
+    def flush(self, timeout=FLUSH_TIMEOUT):
+        # Wait for queued snapshots to be written, failures are reported through failed
+        with self.condition:
+            return self.condition.wait_for(lambda: self.pending is None and not self.writing, timeout)
+
+
+def isKit(entry, named=True):
+    # Checked before use so one hand-edited entry cannot stop the rest from loading
+    if type(entry) is not dict or type(entry.get("slots")) is not list:
+        return False
+    if named and type(entry.get("name")) is not str:
+        return False
+    if type(entry.get("sync", [])) is not list:
+        return False
+    for slot in entry["slots"]:
+        if type(slot) is not list:
+            return False
+        for group in slot:
+            if type(group) is not list or any(type(name) is not str for name in group):
+                return False
+    return True
+
+
+def upgrade(data: dict):
+    version = data.get("version", VERSION)
+    if version < 2:
+        # Sync stored as tri-states per setting and slot, now a bitmask per slot
+        for entry in data["kits"]:
+            if type(entry) is not dict or type(entry.get("sync")) is not list:
+                continue
+            settings = entry["sync"]
+            masks = [0 for _ in settings[0]] if settings else []
+            for option, states in enumerate(settings):
+                for slot, state in enumerate(states[:len(masks)]):
+                    if state == 2:
+                        masks[slot] |= 1 << option
+                    elif state == 1:
+                        masks[slot] |= 1 << (option + len(settings))
+            entry["sync"] = masks
+    data["version"] = VERSION
+    return data
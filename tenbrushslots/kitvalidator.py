@@ -0,0 +1,42 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Ten Brush Slots is a Krita plugin for switching brush presets.
+# Copyright (C) 2023  Lucifer <krita-artists.org/u/Lucifer>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+
+class KitValidator(QThread):
+
+    # Run number and kit to slot index to names of presets not installed
+    validated = pyqtSignal(int, dict)
+
+    def __init__(self, number: int, kits: dict, names: frozenset, slotCount: int, parent=None):
+        super().__init__(parent)
+        # Snapshots taken on the GUI thread, only read here
+        self.number = number
+        self.kits = kits
+        self.names = names
+        self.slotCount = slotCount
+
+    def run(self):
+        report = {}
+        for kit, slots in self.kits.items():
+            for index, slot in enumerate(slots[:self.slotCount]):
+                missing = [name for group in slot for name in group if name not in self.names]
+                if missing:
+                    report.setdefault(kit, {})[index] = missing
+        self.validated.emit(self.number, report)
@@ -0,0 +1,107 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Ten Brush Slots is a Krita plugin for switching brush presets.
+# Copyright (C) 2023  Lucifer <krita-artists.org/u/Lucifer>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import math
+import time
+from functools import wraps
+from contextlib import contextmanager
+
+# Buckets per doubling of duration, each bucket spans about 19%
+STEPS = 4
+# Durations from 1us up to about 70 minutes, longer ones share the last bucket
+BUCKETS = 32 * STEPS
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * BUCKETS
+        self.calls = 0
+        self.max = 0
+
+    def record(self, nanoseconds: int):
+        micro = nanoseconds / 1000
+        bucket = 0
+        if micro >= 1:
+            bucket = min(int(math.log2(micro) * STEPS) + 1, BUCKETS - 1)
+        self.counts[bucket] += 1
+        self.calls += 1
+        if nanoseconds > self.max:
+            self.max = nanoseconds
+
+    def percentile(self, fraction: float) -> float:
+        # Upper bound of the bucket holding the percentile, in milliseconds
+        target = fraction * self.calls
+        total = 0
+        for bucket, count in enumerate(self.counts):
+            total += count
+            if count and total >= target:
+                return min(2 ** (bucket / STEPS), self.max / 1000) / 1000
+        return self.max / 1000000
+
+
+class Latency:
+
+    def __init__(self):
+        self.histograms = {}
+
+    def record(self, name: str, nanoseconds: int):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram()
+        self.histograms[name].record(nanoseconds)
+
+    def timed(self, name: str):
+        def decorator(handler):
+            # Signals pass arguments like checked state, drop those the handler does not take
+            count = handler.__code__.co_argcount
+
+            @wraps(handler)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter_ns()
+                try:
+                    return handler(*args[:count], **kwargs)
+                finally:
+                    self.record(name, time.perf_counter_ns() - start)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def measure(self, name: str):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter_ns() - start)
+
+    def report(self) -> str:
+        lines = [f"{'Handler':<20}{'Calls':>10}{'p50 ms':>12}{'p95 ms':>12}{'Max ms':>12}"]
+        for name, histogram in sorted(self.histograms.items()):
+            lines.append(f"{name:<20}{histogram.calls:>10}{histogram.percentile(0.5):>12.3f}"
+                         f"{histogram.percentile(0.95):>12.3f}{histogram.max / 1000000:>12.3f}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path: str):
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(self.report())
+
+    def clear(self):
+        self.histograms = {}
+
+
+# Shared by all handlers so timing can be applied where they are defined
+LATENCY = Latency()
@@ -0,0 +1,120 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Ten Brush Slots is a Krita plugin for switching brush presets.
+# Copyright (C) 2023  Lucifer <krita-artists.org/u/Lucifer>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import re
+from bisect import bisect_left
+
+# Most results listed while typing, enough to fill the chooser several times
+LIMIT = 200
+# Share of query trigrams a fuzzy match needs
+FUZZY = 0.6
+# Words start after spaces and separators common in preset names
+WORDS = re.compile(r"[^\s_\-.,;()\[\]]+")
+
+
+def trigrams(text: str):
+    padded = f"  {text} "
+    return {padded[index:index+3] for index in range(len(padded) - 2)}
+
+
+class PresetSearch:
+
+    def __init__(self):
+        self.names = []
+        self.keys = frozenset()
+        # Tags of each preset name as of the stamp of Krita's resource database
+        self.tags = {}
+        self.tagStamp = None
+        # Sorted (word, id) of preset name and tag words for prefix lookup
+        self.words = []
+        # Trigram to ids of presets with it in their name or tags
+        self.grams = {}
+        # Lowercase name and tags of each preset for substring checks
+        self.texts = []
+
+    def update(self, names, cache):
+        # Library rarely changes between chooser sessions, keep index if it is the same
+        keys = frozenset(names)
+        tagStamp = cache.stamp()
+        if (keys is self.keys or keys == self.keys) and tagStamp == self.tagStamp:
+            return
+        if tagStamp != self.tagStamp:
+            self.tags = cache.presetTags()
+        self.keys = keys
+        self.tagStamp = tagStamp
+        self.names = sorted(keys, key=str.lower)
+
+        words = []
+        self.grams = {}
+        self.texts = []
+        for id, name in enumerate(self.names):
+            text = " ".join([name] + self.tags.get(name, [])).lower()
+            self.texts.append(text)
+            for word in set(WORDS.findall(text)):
+                words.append((word, id))
+            for gram in trigrams(text):
+                self.grams.setdefault(gram, []).append(id)
+        words.sort()
+        self.words = words
+
+    def search(self, text: str, limit=LIMIT):
+        query = text.strip().lower()
+        if not query:
+            return self.names[:limit]
+
+        # Ranked by prefix of a word, then substring, then shared trigrams
+        ranks = {}
+        terms = WORDS.findall(query) or [query]
+        for id in self.prefixed(terms):
+            ranks[id] = 0
+
+        if len(ranks) >= limit:
+            # Enough prefix matches to fill the list, lower ranks would be cut anyway
+            return [self.names[id] for id in sorted(ranks)[:limit]]
+
+        queryGrams = trigrams(query)
+        counts = {}
+        for gram in queryGrams:
+            for id in self.grams.get(gram, ()):
+                counts[id] = counts.get(id, 0) + 1
+        needed = max(1, int(len(queryGrams) * FUZZY))
+        for id, count in counts.items():
+            if id in ranks or count < needed:
+                continue
+            if query in self.texts[id]:
+                ranks[id] = 1
+            else:
+                ranks[id] = 2 + len(queryGrams) - count
+
+        ids = sorted(ranks, key=lambda id: (ranks[id], id))
+        return [self.names[id] for id in ids[:limit]]
+
+    def prefixed(self, terms: list):
+        # Presets with a word starting with every term
+        found = None
+        for term in terms:
+            ids = set()
+            start = bisect_left(self.words, (term, -1))
+            for word, id in self.words[start:]:
+                if not word.startswith(term):
+                    break
+                ids.add(id)
+            found = ids if found is None else found & ids
+            if not found:
+                return set()
+        return found
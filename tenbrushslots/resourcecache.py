@@ -0,0 +1,93 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Ten Brush Slots is a Krita plugin for switching brush presets.
+# Copyright (C) 2023  Lucifer <krita-artists.org/u/Lucifer>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import sqlite3
+
+# Database Krita keeps of installed resources, their tags and the bundles holding them
+FILE_NAME = "resourcecache.sqlite"
+PRESET_TYPE = "paintoppresets"
+
+
+class ResourceCache:
+
+    def __init__(self, path=""):
+        self.path = path or os.path.join(Application.getAppDataLocation(), FILE_NAME)
+
+    def stamp(self):
+        # Changes whenever Krita updates the database
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except OSError:
+            return None
+
+    def query(self, sql: str, parameters=()):
+        if self.stamp() is None:
+            return []
+        
+        # Opened read-only, Krita owns the database and may be writing to it
+        try:
+            connection = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True)
+            try:
+                return connection.execute(sql, parameters).fetchall()
+            finally:
+                connection.close()
+        except sqlite3.Error:
+            return []
+
+    def presetTags(self):
+        # Names of active presets to the names of their active tags
+        tags = {}
+        rows = self.query("SELECT resources.name, tags.name FROM resources "
+                          "JOIN resource_types ON resource_types.id = resources.resource_type_id "
+                          "JOIN resource_tags ON resource_tags.resource_id = resources.id "
+                          "JOIN tags ON tags.id = resource_tags.tag_id "
+                          "WHERE resource_types.name = ? AND resources.status = 1 "
+                          "AND resource_tags.active = 1 AND tags.active = 1 "
+                          "ORDER BY resources.id", (PRESET_TYPE,))
+        for name, tag in rows:
+            tags.setdefault(name, []).append(tag)
+        return tags
+
+    def tagPresets(self):
+        # Names of active tags to the names of active presets tagged with them
+        presets = {}
+        rows = self.query("SELECT tags.name, resources.name FROM tags "
+                          "JOIN resource_tags ON resource_tags.tag_id = tags.id "
+                          "JOIN resources ON resources.id = resource_tags.resource_id "
+                          "JOIN resource_types ON resource_types.id = resources.resource_type_id "
+                          "WHERE resource_types.name = ? AND resources.status = 1 "
+                          "AND resource_tags.active = 1 AND tags.active = 1 "
+                          "ORDER BY tags.name, resources.name", (PRESET_TYPE,))
+        for tag, name in rows:
+            presets.setdefault(tag, []).append(name)
+        return presets
+
+    def bundlePresets(self):
+        # Names of active bundles to the names of their active presets, in bundle order
+        presets = {}
+        rows = self.query("SELECT storages.location, resources.name FROM resources "
+                          "JOIN storages ON storages.id = resources.storage_id "
+                          "JOIN resource_types ON resource_types.id = resources.resource_type_id "
+                          "WHERE resource_types.name = ? AND resources.status = 1 "
+                          "AND storages.active = 1 AND storages.location LIKE '%.bundle' "
+                          "ORDER BY storages.location, resources.id", (PRESET_TYPE,))
+        for location, name in rows:
+            bundle = os.path.splitext(os.path.basename(location))[0]
+            presets.setdefault(bundle, []).append(name)
+        return presets
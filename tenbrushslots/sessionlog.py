@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Ten Brush Slots is a Krita plugin for switching brush presets.
+# Copyright (C) 2023  Lucifer <krita-artists.org/u/Lucifer>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+import tempfile
+
+FILE_NAME = "tenbrushslots-session.log"
+
+
+class SessionLog:
+
+    def __init__(self, path=""):
+        self.path = path or os.path.join(Application.getAppDataLocation(), FILE_NAME)
+
+    def load(self):
+        # One JSON record per line, later records of a window replace earlier ones
+        records = {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                for line in file:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        # Line cut short by a crash while appending
+                        continue
+                    if type(record) is dict and type(record.get("window")) is int:
+                        records[record["window"]] = record
+        except OSError:
+            pass
+        return records
+
+    def append(self, records: list):
+        if not records:
+            return
+        
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write("".join(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" 
+                               for record in records))
+
+    def compact(self, records: list):
+        # Rewrite with only the latest record of each window, swapped in like KitStorage.save
+        folder = os.path.dirname(self.path)
+        os.makedirs(folder, exist_ok=True)
+        handle, temp = tempfile.mkstemp(prefix=FILE_NAME, suffix=".tmp", dir=folder)
+        try:
+            with os.fdopen(handle, "w", encoding="utf-8") as file:
+                for record in records:
+                    file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            os.replace(temp, self.path)
+        except OSError:
+            if os.path.exists(temp):
+                os.remove(temp)
+            raise
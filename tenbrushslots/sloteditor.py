@@ -17,16 +17,59 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from typing import List, Dict
-from PyQt5.QtCore import Qt, QSize, QItemSelectionModel
-from PyQt5.QtGui import QPixmap, QIcon, QStandardItemModel, QStandardItem
+from collections import OrderedDict
+import json
+from PyQt5.QtCore import (Qt, QSize, QItemSelectionModel, QAbstractListModel, QModelIndex, 
+                          QPersistentModelIndex, QMimeData)
+from PyQt5.QtGui import QPixmap, QIcon
 from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QLabel, QListView, 
                              QStyleOptionViewItem, QPushButton, QMessageBox, QCheckBox, 
-                             QGroupBox, QGridLayout, QComboBox, QListWidget, QRadioButton)
+                             QGroupBox, QGridLayout, QComboBox, QListWidget, QRadioButton, 
+                             QTabWidget, QLineEdit, QWidget, QDialogButtonBox, QFileDialog, QSpinBox)
 from krita import PresetChooser
 
+from .teamlibrary import TEAM, isTeamKit
+
 ICON_WIDTH = 64
 ICON_HEIGHT = 64
 ICON_SIZE = QSize(ICON_WIDTH, ICON_HEIGHT)
+# Memory limit in bytes for preset icons kept between editor sessions
+CACHE_LIMIT = 64 * 1024 * 1024
+# Icon size of presets listed by search in the chooser
+RESULT_SIZE = QSize(32, 32)
+# Slots in a layer of number keys, shown as one tab of the editor and sync dialog
+LAYER = 10
+MAX_SLOTS = 4 * LAYER
+
+
+class IconCache:
+
+    def __init__(self, limit=CACHE_LIMIT):
+        self.limit = limit
+        self.bytes = 0
+        self.icons = OrderedDict()
+
+    def icon(self, preset) -> QIcon:
+        # Saving over a preset stores a new version under another filename
+        key = (preset.name(), preset.filename())
+        if key in self.icons:
+            self.icons.move_to_end(key)
+            return self.icons[key][0]
+
+        pixmap = QPixmap.fromImage(preset.image())
+        size = pixmap.width() * pixmap.height() * pixmap.depth() // 8
+        icon = QIcon(pixmap)
+        self.icons[key] = (icon, size)
+        self.bytes += size
+
+        while self.bytes > self.limit and len(self.icons) > 1:
+            _, (_, size) = self.icons.popitem(last=False)
+            self.bytes -= size
+        return icon
+
+    def clear(self):
+        self.icons.clear()
+        self.bytes = 0
 
 
 class SlotView(QListView):
@@ -67,6 +110,64 @@ class SlotView(QListView):
         self.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
         super().leaveEvent(event)
 
+    def dropEvent(self, event):
+        source = event.source()
+        if not isinstance(source, SlotView) or not event.mimeData().hasFormat(SlotModel.MimeType):
+            event.ignore()
+            return
+
+        row = self.model().rowCount()
+        index = self.indexAt(event.pos())
+        if index.isValid():
+            row = index.row()
+            if event.pos().y() > self.visualRect(index).center().y():
+                row += 1
+
+        rows = sorted(index.row() for index in source.selectedIndexes())
+        if source is self:
+            self.model().moveEntries(rows, row)
+        else:
+            entries = source.model().takeEntries(rows)
+            self.clearSelection()
+            for offset, entry in enumerate(entries):
+                modelIndex = self.model().insertEntry(row + offset, entry)
+                self.selectionModel().select(modelIndex, QItemSelectionModel.SelectionFlag.Select)
+        # Rows are already moved, stop the source view from removing them again
+        event.setDropAction(Qt.DropAction.CopyAction)
+        event.accept()
+
+
+class SearchModel(QAbstractListModel):
+
+    def __init__(self, presets, icons, parent=None):
+        super().__init__(parent)
+
+        self.presets = presets
+        self.icons = icons
+        self.names: List[str] = []
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.names)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.names):
+            return
+        
+        name = self.names[index.row()]
+        if role == Qt.ItemDataRole.DisplayRole or role == Qt.ItemDataRole.ToolTipRole:
+            return name
+        elif role == Qt.ItemDataRole.DecorationRole:
+            preset = self.presets.get(name)
+            if preset is not None:
+                return self.icons.icon(preset)
+
+    def setNames(self, names: List[str]):
+        self.beginResetModel()
+        self.names = names
+        self.endResetModel()
+
 
 class ChoiceDialog(QDialog):
 
@@ -76,23 +177,166 @@ class ChoiceDialog(QDialog):
         self.editor = parent
         self.setWindowTitle(i18n("Preset Chooser"))
         self.mainLayout = QVBoxLayout(self)
+        self.tabs = QTabWidget()
+        self.tabs.addTab(self.loadSearch(), i18n("&Search"))
+        # Stock chooser is slow to build with large libraries, only made when browsed
+        self.presetChooser = None
+        self.tabs.addTab(QWidget(), i18n("&Browse"))
+        self.tabs.currentChanged.connect(self.loadChooser)
+        self.mainLayout.addWidget(self.tabs)
+        self.searchBox.setFocus()
+
+    def loadSearch(self):
+        ten = self.editor.ten
+        ten.search.update(ten.presets.frozenNames(), ten.resourceCache)
+
+        self.searchBox = QLineEdit()
+        self.searchBox.setPlaceholderText(i18n("Search Preset Names and Tags"))
+        self.searchBox.setClearButtonEnabled(True)
+        self.searchBox.textChanged.connect(self.filterPresets)
+        self.searchBox.returnPressed.connect(self.addSelected)
+
+        self.results = QListView()
+        self.resultModel = SearchModel(ten.presets, ten.icons)
+        self.results.setModel(self.resultModel)
+        self.results.setSelectionMode(QListView.SelectionMode.ExtendedSelection)
+        self.results.setEditTriggers(QListView.EditTrigger.NoEditTriggers)
+        self.results.setUniformItemSizes(True)
+        self.results.setIconSize(RESULT_SIZE)
+        self.results.setMinimumSize(360, 420)
+        self.results.doubleClicked.connect(self.addSelected)
+
+        addButton = QPushButton(i18n("&Add Selected"))
+        addButton.setAutoDefault(False)
+        addButton.setToolTip(i18n("Ctrl/Shift+Click to Select Several Presets"))
+        addButton.clicked.connect(self.addSelected)
+
+        page = QWidget()
+        layout = QVBoxLayout(page)
+        layout.addWidget(self.searchBox)
+        layout.addWidget(self.results)
+        layout.addWidget(addButton)
+        self.filterPresets("")
+        return page
+
+    def loadChooser(self, index: int):
+        if index != 1 or self.presetChooser is not None:
+            return
+        
         self.presetChooser = PresetChooser()
-        self.presetChooser.presetClicked.connect(self.checkPreset)
-        self.mainLayout.addWidget(self.presetChooser)
-    
-    def checkPreset(self):
+        self.presetChooser.presetClicked.connect(self.choosePreset)
+        page = self.tabs.widget(1)
+        layout = QVBoxLayout(page)
+        layout.addWidget(self.presetChooser)
+
+    def filterPresets(self, text: str):
+        self.resultModel.setNames(self.editor.ten.search.search(text))
+        if self.resultModel.rowCount():
+            self.results.setCurrentIndex(self.resultModel.index(0))
+
+    def addSelected(self):
+        rows = sorted(index.row() for index in self.results.selectedIndexes())
+        presets = []
+        for row in rows:
+            preset = self.editor.ten.presets.get(self.resultModel.names[row])
+            if self.checkPreset(preset):
+                presets.append(preset)
+        if presets:
+            self.accept(presets)
+
+    def choosePreset(self):
         preset = self.presetChooser.currentPreset()
-        if "," in preset.name() or ";" in preset.name():
-            QMessageBox().warning(self, i18n("Preset Chooser"), 
-            i18n("Unable to read commas( , ) and semicolons( ; ).\n\nPlease rename this preset before adding."))
-        else:
-            self.accept(preset)
+        if self.checkPreset(preset):
+            self.accept([preset])
+    
+    def checkPreset(self, preset):
+        return preset is not None and bool(preset.name())
 
-    def accept(self, preset):
-        self.editor.chosenPreset = preset
+    def accept(self, presets):
+        for preset in presets:
+            self.editor.ten.presets.add(preset)
+        self.editor.chosenPresets = presets
         super().accept()
 
 
+class ImportDialog(QDialog):
+
+    def __init__(self, parent):
+        super().__init__(parent)
+
+        self.editor = parent
+        self.kits = []
+        self.setWindowTitle(i18n("Import Kits"))
+        self.mainLayout = QVBoxLayout(self)
+        # Read once per dialog, switching source type only swaps the list
+        cache = self.editor.ten.resourceCache
+        self.sources = {'tag': cache.tagPresets(), 'bundle': cache.bundlePresets()}
+        # Checked without lookups, an unknown name would rebuild the preset index each time
+        self.names = set(self.editor.ten.presets.names())
+
+        self.sourceBox = QComboBox()
+        self.sourceBox.addItem(i18n("Tags"), 'tag')
+        self.sourceBox.addItem(i18n("Bundles"), 'bundle')
+        self.sourceBox.currentIndexChanged.connect(self.loadSources)
+        self.mainLayout.addWidget(self.sourceBox)
+
+        self.sourceList = QListWidget()
+        self.sourceList.setSelectionMode(QListWidget.SelectionMode.ExtendedSelection)
+        self.sourceList.setMinimumSize(320, 360)
+        self.mainLayout.addWidget(self.sourceList)
+
+        self.kitPerSource = QRadioButton(i18n("&New Kit per Selection, Presets Spread Across Slots"))
+        self.kitPerSource.setChecked(True)
+        slotPerSource = QRadioButton(i18n("&One Kit, a Slot per Selection"))
+        self.mainLayout.addWidget(self.kitPerSource)
+        self.mainLayout.addWidget(slotPerSource)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Ok | QDialogButtonBox.StandardButton.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+        self.mainLayout.addWidget(buttons)
+        self.loadSources()
+
+    def loadSources(self):
+        self.sourceList.clear()
+        for name, presets in self.sources[self.sourceBox.currentData()].items():
+            self.sourceList.addItem(f"{name} ({len(presets)})")
+            self.sourceList.item(self.sourceList.count() - 1).setData(Qt.ItemDataRole.UserRole, name)
+
+    def accept(self):
+        sources = self.sources[self.sourceBox.currentData()]
+        selected = [item.data(Qt.ItemDataRole.UserRole) for item in self.sourceList.selectedItems()]
+        count = len(self.editor.slot.models)
+        if self.kitPerSource.isChecked():
+            for name in selected:
+                self.kits.append((name, self.spreadSlots(self.installed(sources[name]), count)))
+        else:
+            if len(selected) > count:
+                QMessageBox.warning(self, i18n("Import Kits"), 
+                                    i18n(f"{len(selected)} selected but the kit only has {count} slots."))
+                return
+            slots = []
+            added = set()
+            for name in selected:
+                group = [preset for preset in self.installed(sources[name]) if preset not in added]
+                added.update(group)
+                if group:
+                    slots.append([group])
+            self.kits.append((i18n("Imported"), slots + [[] for _ in range(count - len(slots))]))
+        
+        self.kits = [(name, slots) for name, slots in self.kits if any(slots)]
+        super().accept()
+
+    def installed(self, names: List[str]):
+        # Presets are unique within a kit and must be installed
+        return list(dict.fromkeys(name for name in names if name in self.names))
+
+    def spreadSlots(self, names: List[str], count: int):
+        size = -(-len(names) // count)
+        slots = [[names[start:start+size]] for start in range(0, len(names), size or 1)]
+        return slots + [[] for _ in range(count - len(slots))]
+
+
 class SyncConfig(QDialog):
 
     def __init__(self, parent):
@@ -105,87 +349,85 @@ class SyncConfig(QDialog):
         
         self.kitList = QListWidget()
         for index in range(self.editor.kitBox.count()):
-            self.kitList.addItem(self.editor.kitBox.itemText(index))
+            # Team kits are read-only, their sync comes from the library
+            if self.editor.kitBox.itemText(index) not in self.editor.ten.teamKits:
+                self.kitList.addItem(self.editor.kitBox.itemText(index))
         self.kitList.setCurrentRow(0)
         self.kitList.currentItemChanged.connect(self.switchKit)
         self.kitList.setFixedWidth(128)
         self.mainLayout.addWidget(self.kitList)
 
-        self.grid = QGridLayout()
-        self.grid.setHorizontalSpacing(16)
-        self.mainLayout.addLayout(self.grid)
-
-        self.gridButton(i18n("&Settings / Slots"), 0, 0)
-        self.gridButton(i18n("&Erase Mode"), 1, 0)
-        self.gridButton(i18n("&Brush Size"), 2, 0)
-        self.gridButton(i18n("Painting &Opacity"), 3, 0)
-        self.gridButton(i18n("Painting &Flow"), 4, 0)
-        self.gridButton(i18n("Brush &Rotation"), 5, 0)
-        self.gridButton(i18n("Blending &Mode"), 6, 0)
-
-        for index in range(10):
-            action = self.editor.ten.actions[index]
-            self.gridButton(action.shortcut().toString(), 0, index + 1)
-            for i in range(self.grid.rowCount() - 1):
-                box = QCheckBox()
-                box.setTristate(True)
-                box.setToolTip(i18n("If Partially Checked, Only Presets in the Same Group Will Be Synced"))
-                box.stateChanged.connect(self.setEdited)
-                self.grid.addWidget(box, i + 1, index + 1)
-                self.grid.setAlignment(box, Qt.AlignmentFlag.AlignCenter)
+        settings = [i18n("&Erase Mode"), i18n("&Brush Size"), i18n("Painting &Opacity"), 
+                    i18n("Painting &Flow"), i18n("Brush &Rotation"), i18n("Blending &Mode")]
+        # Boxes by setting then slot, and the (slot, setting) of each box
+        self.boxes = [[] for _ in settings]
+        self.cells = {}
+        # Boxes checked by each button
+        self.targets = {}
+
+        # More than one layer of slots are shown a layer per tab, like the editor
+        slotCount = len(self.editor.slot.models)
+        layers = None
+        if slotCount > LAYER:
+            layers = QTabWidget()
+            self.mainLayout.addWidget(layers)
+
+        for start in range(0, slotCount, LAYER):
+            grid = QGridLayout()
+            grid.setHorizontalSpacing(16)
+            layerBoxes = []
+            rowBoxes = [[] for _ in settings]
+            self.gridButton(grid, i18n("&Settings / Slots"), 0, 0, layerBoxes)
+            for option, text in enumerate(settings):
+                self.gridButton(grid, text, option + 1, 0, rowBoxes[option])
+
+            for index in range(start, min(start + LAYER, slotCount)):
+                column = index - start + 1
+                slotBoxes = []
+                self.gridButton(grid, self.editor.slotLabel(index), 0, column, slotBoxes)
+                for option in range(len(settings)):
+                    box = QCheckBox()
+                    box.setTristate(True)
+                    box.setToolTip(i18n("If Partially Checked, Only Presets in the Same Group Will Be Synced"))
+                    box.stateChanged.connect(self.setEdited)
+                    grid.addWidget(box, option + 1, column)
+                    grid.setAlignment(box, Qt.AlignmentFlag.AlignCenter)
+                    self.boxes[option].append(box)
+                    self.cells[box] = (index, option)
+                    for boxes in (layerBoxes, rowBoxes[option], slotBoxes):
+                        boxes.append(box)
+
+            if layers is None:
+                self.mainLayout.addLayout(grid)
+            else:
+                page = QWidget()
+                page.setLayout(grid)
+                layers.addTab(page, i18n(f"Layer {start // LAYER + 1}"))
 
         self.edited = []
         self.loadSettings(self.kitList.currentItem().text())
 
-    def gridButton(self, text: str, row: int, column: int):
+    def gridButton(self, grid: QGridLayout, text: str, row: int, column: int, boxes: List[QCheckBox]):
         button = QPushButton(text)
         button.setAutoDefault(False)
         name = f"Slot {text}" if "&" not in text else text.translate(str.maketrans("", "", "&"))
         button.setToolTip(i18n(f"Check/Uncheck All in {name}"))
         button.clicked.connect(self.checkAll)
-        if column > 0 and len(text) == 1:
+        if column > 0 and len(text) <= 3:
             button.setFixedWidth(36)
-        self.grid.addWidget(button, row, column)
+        grid.addWidget(button, row, column)
+        self.targets[button] = boxes
 
     def checkAll(self):
-        id = self.grid.indexOf(self.sender())
-        rows = self.grid.rowCount()
-        if id < rows:
-            if id == 0:
-                count = self.grid.count()
-                state = self.allState(count)
-                for i in range(rows + 1, count):
-                    box = self.grid.itemAt(i).widget()
-                    if type(box) is not QCheckBox:
-                        continue
-                    box.setCheckState(state)
-            else:
-                state = self.allState(10, id)
-                for i in range(10):
-                    box = self.grid.itemAtPosition(id, i + 1).widget()
-                    box.setCheckState(state)
-        else:
-            id = int(id / rows)
-            state = self.allState(rows - 1, id)
-            for i in range(rows - 1):
-                box = self.grid.itemAtPosition(i + 1, id).widget()
-                box.setCheckState(state)
+        boxes = self.targets[self.sender()]
+        state = self.allState(boxes)
+        for box in boxes:
+            box.setCheckState(state)
 
-    def allState(self, count: int, id=0):
+    def allState(self, boxes: List[QCheckBox]):
         high = 0
         low = 2
-        for i in range(count):
-            box = None
-            if count > 10:
-                box = self.grid.itemAt(i).widget()
-            elif count == 10:
-                box = self.grid.itemAtPosition(id, i + 1).widget()
-            else:
-                box = self.grid.itemAtPosition(i + 1, id).widget()
-            
-            if type(box) is not QCheckBox:
-                continue
-            
+        for box in boxes:
             state = box.checkState()
             if state > high:
                 high = state
@@ -201,29 +443,26 @@ class SyncConfig(QDialog):
         return high
 
     def loadSettings(self, kit: str):
+        # Sync settings of a kit are read when it is first loaded
+        self.editor.ten.getKit(kit)
         settings = self.editor.ten.sync.getSettings(kit)
-        for i, setting in enumerate(settings):
-            for j, state in enumerate(setting):
-                box = self.grid.itemAtPosition(i + 1, j + 1).widget()
+        for boxes, setting in zip(self.boxes, settings):
+            for box, state in zip(boxes, setting):
                 box.setCheckState(state)
         self.edited = []
 
     def saveSettings(self, kit: str):
-        states = []
-        for id in self.edited:
-            box = self.grid.itemAt(id).widget()
-            states.append(box.checkState())
-        if len(self.edited) == len(states):
-            self.editor.ten.sync.changeSettings(kit, self.edited, states)
-            self.editor.ten.updateSettings = True
+        states = [self.boxes[option][slot].checkState() for slot, option in self.edited]
+        self.editor.ten.sync.changeSettings(kit, self.edited, states)
+        self.editor.ten.updateSettings = True
 
     def setEdited(self, state):
-        id = self.grid.indexOf(self.sender())
-        same = self.editor.ten.sync.isStateSame(self.kitList.currentItem().text(), id, state)
-        if same and id in self.edited:
-            self.edited.remove(id)
-        elif not same and id not in self.edited:
-            self.edited.append(id)
+        position = self.cells[self.sender()]
+        same = self.editor.ten.sync.isStateSame(self.kitList.currentItem().text(), *position, state)
+        if same and position in self.edited:
+            self.edited.remove(position)
+        elif not same and position not in self.edited:
+            self.edited.append(position)
     
     def switchKit(self, current, previous):
         if self.edited:
@@ -236,53 +475,170 @@ class SyncConfig(QDialog):
         event.accept()
 
 
-class PresetItem(QStandardItem):
-
-    def __init__(self, icon: QIcon, tooltip: str, parent=None):
-        super().__init__(parent)
-
-        self.setIcon(icon)
-        self.setToolTip(tooltip)
-        self.setSizeHint(ICON_SIZE)
-        self.setEditable(False)
-        self.setDropEnabled(False)
+class SlotModel(QAbstractListModel):
 
+    Divider = i18n("Group Divider")
+    Missing = i18n("{}\n(Not Installed)")
+    MimeType = "application/x-tenbrushslots-rows"
 
-class DividerItem(QStandardItem):
+    def __init__(self, presets, icons, parent=None):
+        super().__init__(parent)
 
-    Name = i18n("Group Divider")
+        self.presets = presets
+        self.icons = icons
+        # Preset names in display order, None for group dividers
+        self.entries: List[str] = []
 
-    def __init__(self, parent=None):
-        super().__init__(parent)
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self.entries)
 
-        self.setIcon(Application.icon('curve-preset-linear'))
-        self.setToolTip(self.Name)
-        self.setStatusTip(self.Name)
-        self.setSizeHint(ICON_SIZE)
-        self.setEditable(False)
-        self.setDropEnabled(False)
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.entries):
+            return
+        
+        name = self.entries[index.row()]
+        if role == Qt.ItemDataRole.DecorationRole:
+            if name is None:
+                return Application.icon('curve-preset-linear')
+            # Icons are only requested for rows scrolled into view
+            preset = self.presets.get(name)
+            if preset is not None:
+                return self.icons.icon(preset)
+            return Application.icon('warning')
+        elif role == Qt.ItemDataRole.ToolTipRole:
+            if name is None:
+                return self.Divider
+            return name if name in self.presets else self.Missing.format(name)
+        elif role == Qt.ItemDataRole.SizeHintRole:
+            return ICON_SIZE
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemFlag.ItemIsDropEnabled
+        return (Qt.ItemFlag.ItemIsSelectable | Qt.ItemFlag.ItemIsEnabled | 
+                Qt.ItemFlag.ItemIsDragEnabled | Qt.ItemFlag.ItemNeverHasChildren)
+
+    def supportedDropActions(self):
+        return Qt.DropAction.MoveAction
+
+    def mimeTypes(self):
+        return [self.MimeType]
+
+    def mimeData(self, indexes):
+        mimeData = QMimeData()
+        entries = [self.entries[index.row()] for index in sorted(indexes, key=lambda x: x.row())]
+        mimeData.setData(self.MimeType, json.dumps(entries).encode())
+        return mimeData
+
+    def moveRows(self, sourceParent, sourceRow, count, destinationParent, destinationChild):
+        if sourceParent.isValid() or destinationParent.isValid():
+            return False
+        if sourceRow <= destinationChild <= sourceRow + count:
+            return False
+        
+        last = sourceRow + count - 1
+        if not self.beginMoveRows(sourceParent, sourceRow, last, destinationParent, destinationChild):
+            return False
+        moving = self.entries[sourceRow:last + 1]
+        del self.entries[sourceRow:last + 1]
+        if destinationChild > sourceRow:
+            destinationChild -= count
+        self.entries[destinationChild:destinationChild] = moving
+        self.endMoveRows()
+        return True
+
+    def removeRows(self, row, count, parent=QModelIndex()):
+        if parent.isValid() or row < 0 or row + count > len(self.entries):
+            return False
+        
+        self.beginRemoveRows(parent, row, row + count - 1)
+        del self.entries[row:row + count]
+        self.endRemoveRows()
+        return True
+
+    def isDivider(self, row: int):
+        return self.entries[row] is None
+
+    def findPreset(self, name: str):
+        try:
+            return self.entries.index(name)
+        except ValueError:
+            return -1
+
+    def insertEntry(self, row: int, name=None):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.entries.insert(row, name)
+        self.endInsertRows()
+        return self.index(row)
+
+    def moveEntries(self, rows: List[int], row: int):
+        # Same order as QListView moving rows within a model, selection is kept
+        persistent = [QPersistentModelIndex(self.index(id)) for id in rows]
+        for index in persistent:
+            if row != index.row() and row != index.row() + 1:
+                self.moveRows(QModelIndex(), index.row(), 1, QModelIndex(), row)
+            row = index.row() + 1
+
+    def takeEntries(self, rows: List[int]):
+        entries = [self.entries[row] for row in rows]
+        for row in sorted(rows, reverse=True):
+            self.removeRows(row, 1)
+        return entries
+
+    def setEntries(self, entries: list):
+        self.beginResetModel()
+        self.entries = entries
+        self.endResetModel()
+
+    def slot(self):
+        slot = []
+        group = []
+        for name in self.entries:
+            if name is None:
+                if group:
+                    slot.append(group)
+                    group = []
+            else:
+                group.append(name)
+        if group:
+            slot.append(group)
+        return slot
 
 
 class SlotElements:
 
-    def __init__(self):
-        self.models: List[QStandardItemModel] = []
+    def __init__(self, presets, icons):
+        self.iconSource = (presets, icons)
+        self.models: List[SlotModel] = []
         self.views: List[SlotView] = []
         self.addButtons: List[QPushButton] = []
         self.grpButtons: List[QPushButton] = []
         self.delButtons: List[QPushButton] = []
         self.presets: Dict[str, int] = {}
         self.shortcuts: List[str] = []
+        self.labels: List[QLabel] = []
 
     def label(self, shortcut: str):
         label = QLabel(shortcut)
         label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.shortcuts.append(shortcut)
+        self.labels.append(label)
         return label
 
+    def setShortcut(self, index: int, shortcut: str):
+        if shortcut == self.shortcuts[index]:
+            return
+        self.shortcuts[index] = shortcut
+        self.labels[index].setText(shortcut)
+        self.addButtons[index].setToolTip(i18n(f"Add Brush Preset to Slot {shortcut}"))
+        self.grpButtons[index].setToolTip(i18n(f"Add Group Divider to Slot {shortcut}"))
+        self.delButtons[index].setToolTip(i18n(f"Delete Selected Items in Slot {shortcut}"))
+
     def modelView(self):
         view = SlotView()
-        model = QStandardItemModel()
+        model = SlotModel(*self.iconSource)
         view.setModel(model)
         self.models.append(model)
         self.views.append(view)
@@ -329,34 +685,86 @@ class SlotElements:
     
     def clear(self):
         for model in self.models:
-            model.clear()
+            model.setEntries([])
         self.presets = {}
 
 
 class SlotEditor(QDialog):
     
-    def __init__(self, title: str, window: int, extension, parent=None):
+    def __init__(self, title: str, window, extension, parent=None):
         super().__init__(parent)
 
         self.ten = extension
-        self.chosenPreset = None
+        self.chosenPresets = []
         self.mainLayout = QVBoxLayout(self)
         self.setWindowTitle(title)
-        self.windex = window
+        self.windowState = window
         self.loadKits()
         self.mainLayout.addSpacing(4)
         self.loadSlots()
         self.mainLayout.addSpacing(8)
         self.loadOptions()
+        self.setKitEditable()
+        self.setFocus()
+        # What the editor last showed, compared on reopen to refresh only what changed
+        self.kitsGeneration = self.ten.kitsGeneration
+        self.presetKeys = self.ten.presets.frozenNames()
+        self.saved = False
+
+    def refresh(self):
+        for index in range(len(self.slot.models)):
+            self.slot.setShortcut(index, self.slotLabel(index))
+
+        # Closing without saving or kits edited elsewhere leaves shown kits stale
+        kits = list(self.ten.kits)
+        stale = not self.saved or self.kitsGeneration != self.ten.kitsGeneration
+        if stale or kits != [self.kitBox.itemText(index) for index in range(self.kitBox.count())]:
+            self.currentIndex = -2
+            self.kitBox.clear()
+            self.kitBox.addItems(kits)
+            stale = True
+        
+        presetKeys = self.ten.presets.frozenNames()
+        if stale or (presetKeys is not self.presetKeys and presetKeys != self.presetKeys) or self.kitBox.currentText() != self.windowState.kit:
+            self.presetKeys = presetKeys
+            self.showKit(self.windowState.kit)
+
+        self.loadOptionStates()
+        self.kitsGeneration = self.ten.kitsGeneration
+        self.saved = False
         self.setFocus()
 
+    def showKit(self, kit: str):
+        self.currentIndex = -2
+        self.kitBox.setCurrentIndex(self.kitBox.findText(kit))
+        self.currentText = self.prevText = self.kitBox.currentText()
+        self.currentIndex = self.prevIndex = self.kitBox.currentIndex()
+
+        self.slot.clear()
+        for index, slot in enumerate(self.ten.getKit(self.currentText)):
+            self.loadModel(index, slot)
+        self.setKitEditable()
+
+    def setKitEditable(self):
+        # Team kits can be viewed and copied, changes only come from their library
+        editable = self.currentText not in self.ten.teamKits
+        self.kitBox.lineEdit().setReadOnly(not editable)
+        self.copyButton.setVisible(not editable)
+        for button in self.personalButtons:
+            button.setEnabled(editable)
+        for button in self.slot.addButtons + self.slot.grpButtons + self.slot.delButtons:
+            button.setEnabled(editable)
+        for view in self.slot.views:
+            view.setDragEnabled(editable)
+            view.viewport().setAcceptDrops(editable)
+
     def loadKits(self):
         self.kitBox = QComboBox()
         self.kitBox.addItems(self.ten.kits.keys())
         self.kitBox.setEditable(True)
         self.kitBox.setInsertPolicy(QComboBox.InsertPolicy.NoInsert)
         self.kitBox.setMinimumWidth(240)
-        self.kitBox.setCurrentIndex(self.kitBox.findText(self.ten.activeKit[self.windex]))
+        self.kitBox.setCurrentIndex(self.kitBox.findText(self.windowState.kit))
         self.currentText = self.kitBox.currentText()
         self.prevText = self.currentText
         self.kitBox.editTextChanged.connect(self.setPrevText)
@@ -388,6 +796,32 @@ class SlotEditor(QDialog):
         deleteKit.setToolTip(i18n("Delete Selected Kit"))
         deleteKit.clicked.connect(self.deleteKit)
 
+        importKits = QPushButton()
+        importKits.setAutoDefault(False)
+        importKits.setIcon(Application.icon('document-import'))
+        importKits.setToolTip(i18n("Import Kits from Tags/Bundles"))
+        importKits.clicked.connect(self.importKits)
+
+        self.copyButton = QPushButton()
+        self.copyButton.setAutoDefault(False)
+        self.copyButton.setIcon(Application.icon('edit-copy'))
+        self.copyButton.setToolTip(i18n("Copy Team Kit to Personal Kits"))
+        self.copyButton.clicked.connect(self.copyKit)
+
+        teamButton = QPushButton()
+        teamButton.setAutoDefault(False)
+        teamButton.setIcon(Application.icon('folder'))
+        teamButton.setToolTip(i18n("Choose Team Kit Library Folder"))
+        teamButton.clicked.connect(self.chooseTeamLibrary)
+        # Disabled while a read-only team kit is selected
+        self.personalButtons = [moveUp, moveDown, deleteKit]
+
+        self.missingButton = QPushButton()
+        self.missingButton.setAutoDefault(False)
+        self.missingButton.setIcon(Application.icon('warning'))
+        self.missingButton.clicked.connect(self.reportMissing)
+        self.showMissing()
+
         kitsLayout = QHBoxLayout()
         kitsLayout.addStretch()
         kitsLayout.addWidget(QLabel(i18n("Select Kit:")))
@@ -396,73 +830,85 @@ class SlotEditor(QDialog):
         kitsLayout.addWidget(moveUp)
         kitsLayout.addWidget(moveDown)
         kitsLayout.addWidget(deleteKit)
+        kitsLayout.addWidget(importKits)
+        kitsLayout.addWidget(self.copyButton)
+        kitsLayout.addWidget(teamButton)
+        kitsLayout.addWidget(self.missingButton)
         kitsLayout.addStretch()
         self.mainLayout.addLayout(kitsLayout)
 
     def loadSlots(self):
-        self.slot = SlotElements()
-        slotLayout = QHBoxLayout()
-        allPresets = Application.resources('preset')
-        kit = self.ten.kits[self.ten.activeKit[self.windex]]
-
-        for index, slot in enumerate(kit):
-            buttonLayout = QVBoxLayout()
-            action = self.ten.actions[index]
-            buttonLayout.addWidget(self.slot.label(action.shortcut().toString()))
-
-            buttonLayout.addWidget(self.slot.modelView())
-            self.loadModel(allPresets, index, slot)
-
-            buttonLayout.addWidget(self.slot.addButton(self.insertPreset))
-            buttonLayout.addWidget(self.slot.grpButton(self.insertDividers))
-            buttonLayout.addWidget(self.slot.delButton(self.removeItems))
+        self.slot = SlotElements(self.ten.presets, self.ten.icons)
+        kit = self.ten.kits[self.windowState.kit]
+        # More than one layer of slots are shown a layer per tab
+        layers = None
+        if len(kit) > LAYER:
+            layers = QTabWidget()
+            self.mainLayout.addWidget(layers)
+
+        for start in range(0, len(kit), LAYER):
+            slotLayout = QHBoxLayout()
+            for index in range(start, min(start + LAYER, len(kit))):
+                buttonLayout = QVBoxLayout()
+                buttonLayout.addWidget(self.slot.label(self.slotLabel(index)))
+
+                buttonLayout.addWidget(self.slot.modelView())
+                self.loadModel(index, kit[index])
+
+                buttonLayout.addWidget(self.slot.addButton(self.insertPreset))
+                buttonLayout.addWidget(self.slot.grpButton(self.insertDividers))
+                buttonLayout.addWidget(self.slot.delButton(self.removeItems))
+
+                slotLayout.addLayout(buttonLayout)
+            if layers is None:
+                self.mainLayout.addLayout(slotLayout)
+            else:
+                page = QWidget()
+                page.setLayout(slotLayout)
+                layers.addTab(page, i18n(f"Layer {start // LAYER + 1}"))
 
-            slotLayout.addLayout(buttonLayout)
-        self.mainLayout.addLayout(slotLayout)
+    def slotLabel(self, index: int):
+        # Slots in later layers may have no shortcut assigned yet
+        return self.windowState.actions[index].shortcut().toString() or self.ten.slotNames[index]
 
-    def loadModel(self, allPresets: dict, index: int, slot: List[List[str]]):
-        model = self.slot.models[index]
+    def loadModel(self, index: int, slot: List[List[str]]):
+        entries = []
         for group in slot:
             for name in group:
-                if name in allPresets:
-                    if name in self.slot.presets:
-                        continue
-                    preset = PresetItem(QIcon(QPixmap.fromImage(allPresets[name].image())), name)
-                    model.appendRow(preset)
-                    self.slot.presets[name] = index
+                # Presets not installed stay as placeholders so saving keeps them
+                if name in self.slot.presets:
+                    continue
+                entries.append(name)
+                self.slot.presets[name] = index
             if len(slot) - slot.index(group) > 1:
-                divider = DividerItem()
-                model.appendRow(divider)
+                entries.append(None)
+        self.slot.models[index].setEntries(entries)
 
     def loadOptions(self):
         self.activatePrevBox = QCheckBox(i18n("Switch to Previous &Brush on 2nd Press"))
-        self.activatePrevBox.setChecked(self.ten.activatePrev)
 
         self.activateNextBox = QGroupBox(i18n("Switch to &Next Group/Position on 2nd Press"))
         self.activateNextBox.setToolTip(
             i18n("Overrides Switch to Previous Brush if Slot Contains Multiple Groups/Presets"))
         self.activateNextBox.setCheckable(True)
-        self.activateNextBox.setChecked(self.ten.activateNext)
 
         self.nextGroupButton = QRadioButton(i18n("&Group"))
-        nextPositionButton = QRadioButton(i18n("&Position"))
-        if self.ten.nextGroup:
-            self.nextGroupButton.setChecked(True)
-        else:
-            nextPositionButton.setChecked(True)
+        self.nextPositionButton = QRadioButton(i18n("&Position"))
 
         nextBoxLayout = QHBoxLayout()
         nextBoxLayout.addWidget(self.nextGroupButton)
-        nextBoxLayout.addWidget(nextPositionButton)
+        nextBoxLayout.addWidget(self.nextPositionButton)
         self.activateNextBox.setLayout(nextBoxLayout)
 
         self.autoBrushBox = QCheckBox(i18n("&Auto-Select Freehand Brush Tool"))
         self.autoBrushBox.setToolTip(i18n("Also Prevents 2nd Press Switching if Tool Not Selected"))
-        self.autoBrushBox.setChecked(self.ten.autoBrush)
+
+        self.coalesceBox = QCheckBox(i18n("Coa&lesce Rapid Switching"))
+        self.coalesceBox.setToolTip(
+            i18n("Only Activate the Last Preset When Switching Group/Position in Quick Succession"))
         
         self.syncBox = QGroupBox(i18n("&Sync Settings When Switching Group/Position"))
         self.syncBox.setCheckable(True)
-        self.syncBox.setChecked(self.ten.sync.active)
 
         configButton = QPushButton(i18n("&Configure Syncing"))
         configButton.setAutoDefault(False)
@@ -477,8 +923,38 @@ class SlotEditor(QDialog):
         optionsLayout.addWidget(self.activateNextBox, 1, 0)
         optionsLayout.addWidget(self.autoBrushBox, 0, 1)
         optionsLayout.addWidget(self.syncBox, 1, 1)
+        optionsLayout.addWidget(self.coalesceBox, 2, 1)
+        optionsLayout.addLayout(self.slotCountLayout(), 2, 0)
         optionsLayout.setVerticalSpacing(16)
         self.mainLayout.addLayout(optionsLayout)
+        self.loadOptionStates()
+
+    def slotCountLayout(self):
+        self.slotCountBox = QSpinBox()
+        self.slotCountBox.setRange(LAYER, MAX_SLOTS)
+        self.slotCountBox.setSingleStep(LAYER)
+        self.slotCountBox.setToolTip(i18n("Slots After the First 10 Are Activated by Shortcuts of Later Layers, "
+                                          "Changes Apply After Restarting Krita"))
+        label = QLabel(i18n("Number of Sl&ots:"))
+        label.setBuddy(self.slotCountBox)
+
+        layout = QHBoxLayout()
+        layout.addWidget(label)
+        layout.addWidget(self.slotCountBox)
+        layout.addStretch()
+        return layout
+
+    def loadOptionStates(self):
+        self.activatePrevBox.setChecked(self.ten.activatePrev)
+        self.activateNextBox.setChecked(self.ten.activateNext)
+        if self.ten.nextGroup:
+            self.nextGroupButton.setChecked(True)
+        else:
+            self.nextPositionButton.setChecked(True)
+        self.autoBrushBox.setChecked(self.ten.autoBrush)
+        self.coalesceBox.setChecked(self.ten.coalesce)
+        self.syncBox.setChecked(self.ten.sync.active)
+        self.slotCountBox.setValue(self.ten.nextSlotCount)
 
     def openConfig(self):
         self.saveKit(self.currentIndex, self.currentText)
@@ -500,10 +976,10 @@ class SlotEditor(QDialog):
         
         self.slot.clear()
         if self.currentText in self.ten.kits:
-            allPresets = Application.resources('preset')
-            kit = self.ten.kits[self.currentText]
+            kit = self.ten.getKit(self.currentText)
             for index, slot in enumerate(kit):
-                self.loadModel(allPresets, index, slot)
+                self.loadModel(index, slot)
+        self.setKitEditable()
 
     def getUniqueName(self, name: str):
         copy = i18n("Copy")
@@ -521,6 +997,67 @@ class SlotEditor(QDialog):
         index = self.kitBox.findText(name)
         self.kitBox.setCurrentIndex(index)
 
+    def importKits(self):
+        importDialog = ImportDialog(self)
+        if not importDialog.exec() or not importDialog.kits:
+            return
+        
+        # Kits are only stored when the editor closes, in one write with other changes
+        self.saveKit(self.currentIndex, self.currentText)
+        for kit, slots in importDialog.kits:
+            name = self.getUniqueName(kit)
+            self.ten.updateKit(name, slots)
+            if not self.ten.sync.isKitStored(name):
+                self.ten.sync.newKit(name)
+            self.kitBox.addItem(name)
+
+        self.currentIndex = -1
+        self.kitBox.setCurrentIndex(self.kitBox.findText(name))
+
+    def copyKit(self):
+        kit = self.currentText
+        if kit not in self.ten.teamKits:
+            return
+        
+        name = self.getUniqueName(kit[len(TEAM):])
+        self.ten.updateKit(name, [[list(group) for group in slot] for slot in self.ten.getKit(kit)])
+        self.ten.sync.newKit(name)
+        self.ten.sync.setMasks(name, self.ten.sync.getMasks(kit))
+        self.kitBox.addItem(name)
+
+        self.currentIndex = -1
+        self.kitBox.setCurrentIndex(self.kitBox.findText(name))
+
+    def chooseTeamLibrary(self):
+        folder = QFileDialog.getExistingDirectory(self, i18n("Team Kit Library"), self.ten.teamFolder)
+        if not folder or folder == self.ten.teamFolder:
+            return
+        
+        self.saveKit(self.currentIndex, self.currentText)
+        kit = self.currentText
+        self.ten.setTeamLibrary(folder)
+        self.ten.updateSettings = True
+
+        self.currentIndex = -2
+        self.kitBox.clear()
+        self.kitBox.addItems(self.ten.kits)
+        self.showKit(kit if kit in self.ten.kits else self.windowState.kit)
+
+    def showMissing(self):
+        count = sum(len(names) for slots in self.ten.missingPresets.values() for names in slots.values())
+        self.missingButton.setToolTip(i18n("{} Presets in Kits Not Installed").format(count))
+        self.missingButton.setVisible(count > 0)
+
+    def reportMissing(self):
+        lines = []
+        for kit, slots in self.ten.missingPresets.items():
+            lines.append(i18n("Kit {}:").format(kit) if kit else i18n("Unnamed Kit:"))
+            for index, names in sorted(slots.items()):
+                lines.append(i18n("    Slot {}: {}").format(index + 1, ", ".join(names)))
+        QMessageBox().information(self, i18n("Missing Presets"), 
+                                  i18n("These presets are kept in their slots until installed or deleted.\n\n")
+                                  + "\n".join(lines))
+
     def moveKit(self):
         length = self.kitBox.count()
         if length > 1:
@@ -547,66 +1084,53 @@ class SlotEditor(QDialog):
         
         if confirmDelete == QMessageBox.StandardButton.Yes:
             kit = self.kitBox.itemText(self.currentIndex)
-            self.ten.removeKit(kit)
-            if self.ten.sync.isKitStored(kit):
-                self.ten.sync.removeKit(kit)
-            
-            if self.kitBox.count() > 1:
+            # Last personal kit is replaced by an empty one in its place
+            if not self.ten.removeKit(kit):
                 self.currentIndex = -1
                 self.kitBox.removeItem(self.kitBox.currentIndex())
             else:
-                self.kitBox.setItemText(0, "")
+                self.kitBox.setItemText(self.kitBox.currentIndex(), "")
                 self.slot.clear()
 
     def insertPreset(self):
         index = self.slot.addButtons.index(self.sender())
         choosePreset = ChoiceDialog(self)
         if choosePreset.exec():
-            preset = self.chosenPreset
-
-            if preset.name() in self.slot.presets:
-                prevIndex = self.slot.presets[preset.name()]
-                shortcut = self.slot.shortcuts[prevIndex]
-                movePreset = QMessageBox().question(self, i18n("Preset Chooser"), 
-                                                    i18n(f"Preset already in slot {shortcut}.\n\nMove it instead?"))
-                
-                if movePreset == QMessageBox.StandardButton.No:
-                    return
-                elif movePreset == QMessageBox.StandardButton.Yes:
-                    remove = -1
-                    prevModel = self.slot.models[prevIndex]
-                    
-                    for row in range(prevModel.rowCount()):
-                        item =  prevModel.item(row)
-                        if item.toolTip() == preset.name() and item.statusTip() != DividerItem.Name:
-                            remove = row
-                            break
-                    
-                    if remove >= 0:
-                        prevModel.removeRow(remove)
-
-            self.slot.presets[preset.name()] = index
-            view = self.slot.views[index]
-            model =  self.slot.models[index]
-            selectedIndexes = view.selectedIndexes()
-            view.clearSelection()
-
-            if selectedIndexes == []:
-                view.scrollTo(self.insertItem(model, view, model.rowCount(), preset))
-                return
+            # Each preset goes after the one inserted before it
+            for preset in self.chosenPresets:
+                self.insertChosen(index, preset)
+
+    def insertChosen(self, index: int, preset):
+        if preset.name() in self.slot.presets:
+            prevIndex = self.slot.presets[preset.name()]
+            shortcut = self.slot.shortcuts[prevIndex]
+            movePreset = QMessageBox().question(self, i18n("Preset Chooser"), 
+                                                i18n(f"Preset already in slot {shortcut}.\n\nMove it instead?"))
             
-            selectedIndexes.sort(key=lambda x: model.itemFromIndex(x).row())
-            row = model.itemFromIndex(selectedIndexes[0]).row() + 1
-            view.scrollTo(self.insertItem(model, view, row, preset))
+            if movePreset == QMessageBox.StandardButton.No:
+                return
+            elif movePreset == QMessageBox.StandardButton.Yes:
+                prevModel = self.slot.models[prevIndex]
+                remove = prevModel.findPreset(preset.name())
+                if remove >= 0:
+                    prevModel.removeRows(remove, 1)
 
-    def insertItem(self, model: QStandardItemModel, view: QListView, row: int, preset=None):
-        if preset != None:
-            item = PresetItem(QIcon(QPixmap.fromImage(preset.image())), preset.name())
-        else:
-            item = DividerItem()
+        self.slot.presets[preset.name()] = index
+        view = self.slot.views[index]
+        model =  self.slot.models[index]
+        selectedIndexes = view.selectedIndexes()
+        view.clearSelection()
+
+        if selectedIndexes == []:
+            view.scrollTo(self.insertItem(model, view, model.rowCount(), preset))
+            return
         
-        model.insertRow(row, item)
-        modelIndex = model.indexFromItem(item)
+        selectedIndexes.sort(key=lambda x: x.row())
+        row = selectedIndexes[0].row() + 1
+        view.scrollTo(self.insertItem(model, view, row, preset))
+
+    def insertItem(self, model: SlotModel, view: QListView, row: int, preset=None):
+        modelIndex = model.insertEntry(row, preset.name() if preset is not None else None)
         view.selectionModel().select(modelIndex, QItemSelectionModel.SelectionFlag.Select)
         return modelIndex
 
@@ -623,23 +1147,23 @@ class SlotEditor(QDialog):
         
         rows = []
         for modelIndex in selectedIndexes:
-            rows.append(model.itemFromIndex(modelIndex).row())
+            rows.append(modelIndex.row())
         
         for endStart in self.getReversedRanges(rows):
             end = endStart[0]
             start = endStart[1]
             
-            if model.item(end).statusTip() != DividerItem.Name:
+            if not model.isDivider(end):
                 if end < model.rowCount() - 1:
-                    if model.item(end + 1).statusTip() != DividerItem.Name:
+                    if not model.isDivider(end + 1):
                         self.insertItem(model, view, end + 1)
             
-            if model.item(start).statusTip() != DividerItem.Name:
+            if not model.isDivider(start):
                 if start > 0:
-                    if model.item(start - 1).statusTip() != DividerItem.Name:
+                    if not model.isDivider(start - 1):
                         self.insertItem(model, view, start)
         
-        newIndexes = sorted(view.selectedIndexes(), key=lambda x : model.itemFromIndex(x).row())
+        newIndexes = sorted(view.selectedIndexes(), key=lambda x : x.row())
         if newIndexes:
             view.scrollTo(newIndexes[0])
 
@@ -661,39 +1185,25 @@ class SlotEditor(QDialog):
         
         rows = []
         for modelIndex in view.selectedIndexes():
-            rows.append(model.itemFromIndex(modelIndex).row())
+            rows.append(modelIndex.row())
         
         for row in sorted(rows, reverse=True):
-            model.removeRow(row)
+            model.removeRows(row, 1)
 
     def editedSlots(self, kit: str):
-        slots = []
-        for index in range(len(self.slot.models)):
-            model = self.slot.models[index]
-            
-            slot = []
-            group = []
-            for row in range(model.rowCount()):
-                item = model.item(row)
-                if item.statusTip() == DividerItem.Name:
-                    if group:
-                        slot.append(group)
-                        group = []
-                else:
-                    group.append(item.toolTip())
-            if group:
-                slot.append(group)
-            slots.append(slot)
+        slots = [model.slot() for model in self.slot.models]
 
         if kit not in self.ten.kits:
             return slots
         
-        if slots != self.ten.kits[kit]:
+        if slots != self.ten.getKit(kit):
             return slots
     
     def saveKit(self, index: int, text: str):
         kit = self.kitBox.itemText(index)
-        text = text.replace(",", " ")
+        # Team kits are never stored, nor ones whose library file went away while shown
+        if kit in self.ten.teamKits or (isTeamKit(kit) and kit not in self.ten.kits):
+            return
         stored = self.ten.sync.isKitStored(kit)
 
         if kit != text:
@@ -736,12 +1246,22 @@ class SlotEditor(QDialog):
             self.ten.autoBrush = self.autoBrushBox.isChecked()
             self.ten.updateSettings = True
         
+        if self.ten.coalesce != self.coalesceBox.isChecked():
+            self.ten.coalesce = self.coalesceBox.isChecked()
+            self.ten.updateSettings = True
+
         if self.ten.sync.active != self.syncBox.isChecked():
             self.ten.sync.active = self.syncBox.isChecked()
             self.ten.updateSettings = True
 
-        if self.currentText != self.ten.activeKit[self.windex] or self.currentText in self.ten.kitsEdited:
-            self.ten.setActiveKit(self.currentText, self.windex)
+        if self.ten.nextSlotCount != self.slotCountBox.value():
+            self.ten.nextSlotCount = self.slotCountBox.value()
+            self.ten.updateSettings = True
+
+        if self.currentText != self.windowState.kit or self.currentText in self.ten.kitsEdited:
+            self.ten.setActiveKit(self.currentText, self.windowState)
 
+        self.kitsGeneration = self.ten.kitsGeneration
+        self.saved = True
         event.accept()
 
@@ -0,0 +1,93 @@
+# SPDX-License-Identifier: GPL-3.0-or-later
+#
+# Ten Brush Slots is a Krita plugin for switching brush presets.
+# Copyright (C) 2023  Lucifer <krita-artists.org/u/Lucifer>
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import os
+import json
+from PyQt5.QtCore import QFileSystemWatcher
+
+from .kitstorage import VERSION, upgrade, isKit
+
+# Team kits are named after their file with this prefix, personal kits never use it
+TEAM = "Team/"
+# Folder used when none is chosen in the editor, for deploying to many workstations
+ENVIRONMENT = "TENBRUSHSLOTS_TEAM_LIBRARY"
+SUFFIX = ".json"
+
+
+def isTeamKit(kit: str):
+    return kit.startswith(TEAM)
+
+
+class TeamLibrary:
+
+    def __init__(self):
+        self.folder = ""
+        # Kit name to path of its file, files are only parsed when a kit is first used
+        self.files = {}
+        self.watcher = QFileSystemWatcher()
+
+    def setFolder(self, folder: str):
+        paths = self.watcher.files() + self.watcher.directories()
+        if paths:
+            self.watcher.removePaths(paths)
+        self.folder = folder
+        self.files = {}
+        if folder and os.path.isdir(folder):
+            self.watcher.addPath(folder)
+
+    def kitName(self, path: str):
+        return TEAM + os.path.splitext(os.path.basename(path))[0]
+
+    def update(self):
+        # Kit files added and removed since the last scan, only those are watched or dropped
+        files = {}
+        if self.folder:
+            try:
+                entries = sorted(os.scandir(self.folder), key=lambda entry: entry.name.lower())
+            except OSError:
+                entries = []
+            for entry in entries:
+                if entry.name.endswith(SUFFIX) and entry.is_file():
+                    files[self.kitName(entry.path)] = entry.path
+
+        added = [kit for kit in files if kit not in self.files]
+        removed = [kit for kit in self.files if kit not in files]
+        if removed:
+            self.watcher.removePaths([self.files[kit] for kit in removed])
+        if added:
+            self.watcher.addPaths([files[kit] for kit in added])
+        self.files = files
+        return added, removed
+
+    def watch(self, path: str):
+        # Files saved by replacing them drop out of the watcher
+        if os.path.isfile(path) and path not in self.watcher.files():
+            self.watcher.addPath(path)
+
+    def read(self, kit: str):
+        # Same layout as a kit entry in tenbrushslots.json, never written back
+        try:
+            with open(self.files[kit], "r", encoding="utf-8") as file:
+                entry = json.load(file)
+        except (KeyError, OSError, ValueError):
+            entry = None
+        if not isKit(entry, named=False):
+            return {"slots": []}
+        
+        data = upgrade({"version": entry.get("version", VERSION), "kits": [entry]})
+        return data["kits"][0]
@@ -16,20 +16,42 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+import os
+import time
+from functools import partial
 from PyQt5.QtCore import QTimer
-from PyQt5.QtGui import QPixmap, QIcon
-from PyQt5.QtWidgets import QDockWidget, QToolButton
+from PyQt5.QtWidgets import QDockWidget, QToolButton, QFileDialog, QMessageBox
 from krita import Extension
 
-from .sloteditor import SlotEditor
+from .sloteditor import SlotEditor, IconCache, LAYER, MAX_SLOTS
+from .kitstorage import KitStorage, SaveQueue, isKit
+from .kitvalidator import KitValidator
+from .sessionlog import SessionLog
+from .teamlibrary import TeamLibrary, ENVIRONMENT
+from .resourcecache import ResourceCache
+from .presetsearch import PresetSearch
+from .latency import LATENCY
 
 EXTENSION_ID = "pykrita_tenbrushslots"
 MENU_ENTRY = i18n("Ten Brush Slots")
+EXPORT_ID = "tenbrushslots_export_latency"
+EXPORT_ENTRY = i18n("Export Ten Brush Slots Latency...")
+# Number keys of the first layer of slots
 SLOTS = ['1', '2', '3', '4', '5', '6', '7', '8', '9', '0']
-# Amount of actions appended to self.actions list per window
-ACTIONS = 16
 # Floating message duration in ms
 TIME = 1000
+# Cycling presses closer than this in ms are coalesced when enabled
+COALESCE = 60
+# Floating messages closer than this in ms only show the last one
+THROTTLE = 80
+# Switching state is appended to the session log once idle for this long in ms
+SESSION_DELAY = 2000
+
+
+def slotNames(count: int):
+    # Later layers repeat the number keys after their layer, like 2-1 for the 11th slot
+    return [SLOTS[index] if index < LAYER else f"{index // LAYER + 1}-{SLOTS[index % LAYER]}"
+            for index in range(count)]
 
 
 class ActionPreset:
@@ -56,114 +78,273 @@ class ActionCycle:
             return -(self.Value)
         
 
-class SlotSync:
+class PresetIndex:
 
     def __init__(self):
+        self.presets = None
+        # Names looked up but not found since the last full build
+        self.missing = set()
+        # Incremented whenever entries may have changed
+        self.generation = 0
+        # Frozen names as of a generation, shared by validation and the editor
+        self.snapshot = frozenset()
+        self.snapshotGeneration = -1
+
+    def build(self):
+        self.presets = Application.resources('preset')
+        self.missing = {name for name in self.missing if name not in self.presets}
+        self.generation += 1
+
+    def refresh(self):
+        # Next lookup rebuilds, names still missing after that stay known as missing
+        self.presets = None
+        self.generation += 1
+
+    def get(self, name: str):
+        if self.presets is None:
+            self.build()
+
+        preset = self.presets.get(name)
+        if preset is not None and preset.name() != name:
+            # Renamed since indexed, move entry to its new name
+            self.rename(name, preset.name())
+            preset = None
+
+        if preset is None and name not in self.missing:
+            # Library may have changed since last build, rebuild once per unknown name
+            self.build()
+            preset = self.presets.get(name)
+            if preset is None:
+                self.missing.add(name)
+        return preset
+
+    def markMissing(self, names):
+        # Found missing by a full check, lookups of them need not rebuild
+        if self.presets is not None:
+            self.missing.update(name for name in names if name not in self.presets)
+
+    def add(self, preset):
+        if self.presets is None:
+            self.build()
+        self.presets[preset.name()] = preset
+        self.missing.discard(preset.name())
+        self.generation += 1
+
+    def rename(self, prevName: str, newName: str):
+        if self.presets is not None and prevName in self.presets:
+            self.presets[newName] = self.presets.pop(prevName)
+            self.missing.discard(newName)
+        self.missing.add(prevName)
+        self.generation += 1
+
+    def names(self):
+        if self.presets is None:
+            self.build()
+        return self.presets.keys()
+
+    def frozenNames(self):
+        if self.presets is None:
+            self.build()
+        if self.snapshotGeneration != self.generation:
+            self.snapshot = frozenset(self.presets)
+            self.snapshotGeneration = self.generation
+        return self.snapshot
+
+    def has(self, name: str):
+        # Reads the current index only, for checking many names without a rebuild per missing one
+        if self.presets is None:
+            self.build()
+        return name in self.presets
+
+    def __contains__(self, name: str):
+        return self.get(name) is not None
+
+
+class Neighbours:
+
+    def __init__(self, kit: str, slot: int, preset: ActionPreset, kitIndex: dict, generation: int):
+        # Valid while the same preset is current and neither the kit nor the library changed
+        self.key = (kit, slot, preset.group, preset.name)
+        self.kitIndex = kitIndex
+        self.generation = generation
+        # (order, vector) to (group, name, resource) of the preset a cycle would activate
+        self.targets = {}
+
+    def get(self, kit: str, slot: int, preset: ActionPreset, kitIndex: dict, generation: int, order: str, vector: int):
+        if (kit, slot, preset.group, preset.name) != self.key:
+            return
+        if kitIndex is not self.kitIndex or generation != self.generation:
+            return
+        return self.targets.get((order, vector))
+
+
+class WindowState:
+
+    __slots__ = ('actions', 'kit', 'currentSlot', 'prevSlot', 'prevPreset', 'neighbours', 'editor')
+
+    def __init__(self, kit: str):
+        # Slot actions in slot order, then cycle actions
+        self.actions = []
+        # Current kit/slot for switching presets
+        self.kit = kit
+        self.currentSlot = 0
+        # Previous preset to activate on second press
+        self.prevSlot = 0
+        self.prevPreset = None
+        # Resolved next/previous group and position of current preset
+        self.neighbours = None
+        # Editor kept for the window's lifetime, later opens only refresh it
+        self.editor = None
+
+
+class Burst:
+
+    def __init__(self, window: WindowState, slot: int, preset: ActionPreset, sameGroup: bool):
+        self.window = window
+        self.slot = slot
+        # Preset the burst has reached so far, only activated when it ends
+        self.preset = preset
+        self.target = None
+        self.sameGroup = sameGroup
+
+
+class FloatingMessage:
+
+    # Translated once, formatted per kit and preset when first shown
+    Selected = i18n("{}\nselected")
+    Missing = i18n("{}Missing Preset")
+    Empty = i18n("{}Empty Slot")
+    Kit = i18n("{}Kit\nselected")
+    # Formatted preset texts kept before starting over
+    LIMIT = 4096
+
+    def __init__(self, icons):
+        self.icons = icons
+        self.messageIcons = {}
+        # Kit to message texts, and (kit, preset name) to selected text
+        self.kits = {}
+        self.selected = {}
+        # Message waiting for the throttle interval to end, as (view, kit, message)
+        self.pending = None
+        self.shown = 0
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.flush)
+
+    def show(self, view, kit: str, message: str):
+        elapsed = (time.monotonic_ns() - self.shown) // 1000000
+        self.pending = (view, kit, message)
+        if elapsed >= THROTTLE and not self.timer.isActive():
+            self.flush()
+        elif not self.timer.isActive():
+            # Superseded messages are never rendered, only the last one shows
+            self.timer.start(THROTTLE - elapsed)
+
+    def flush(self):
+        if self.pending is None:
+            return
+        
+        view, kit, message = self.pending
+        self.pending = None
+        self.shown = time.monotonic_ns()
+        if message == 'selected':
+            activePreset = view.currentBrushPreset()
+            view.showFloatingMessage(self.selectedText(kit, activePreset.name()), 
+                                     self.icons.icon(activePreset), TIME, 1)
+        else:
+            view.showFloatingMessage(self.kitText(kit, message), self.messageIcon(message), TIME, 1)
+
+    def selectedText(self, kit: str, name: str):
+        text = self.selected.get((kit, name))
+        if text is None:
+            if len(self.selected) >= self.LIMIT:
+                self.selected = {}
+            text = self.Selected.format(f"{kit}: {name}" if kit else name)
+            self.selected[(kit, name)] = text
+        return text
+
+    def kitText(self, kit: str, message: str):
+        texts = self.kits.get(kit)
+        if texts is None:
+            prefix = f"{kit}: " if kit else ""
+            texts = {'missing': self.Missing.format(prefix),
+                     'empty': self.Empty.format(prefix),
+                     'kit': self.Kit.format(f"{kit} " if kit else "")}
+            self.kits[kit] = texts
+        return texts[message]
+
+    def messageIcon(self, message: str):
+        if message not in self.messageIcons:
+            self.messageIcons[message] = Application.icon('krita_tool_freehand' if message == 'kit' else 'warning')
+        return self.messageIcons[message]
+
+
+class SlotSync:
+
+    # Bit of each setting in a sync policy, in the row order of SyncConfig
+    Options = ['erase', 'size', 'opacity', 'flow', 'rotation', 'blending']
+    ERASE, SIZE, OPACITY, FLOW, ROTATION, BLENDING = (1 << bit for bit in range(len(Options)))
+    ALL = (1 << len(Options)) - 1
+    # Low bits of a slot's mask are always synced, high bits only within the same group
+    GROUP = len(Options)
+
+    def __init__(self, slotCount: int):
         self.active = True
-        self.erase = {}
-        self.size = {}
-        self.opacity = {}
-        self.flow = {}
-        self.rotation = {}
-        self.blending = {}
-
-    def isStateSame(self, kit: str, id: int, state: int):
-        option = id % 7
-        slot = int(((id - option) / 7) - 1)
-        if 0 <= slot <= 9:
-            match option:
-                case 1:
-                    return self.erase[kit][slot] == state
-                case 2:
-                    return self.size[kit][slot] == state
-                case 3:
-                    return self.opacity[kit][slot] == state
-                case 4:
-                    return self.flow[kit][slot] == state
-                case 5:
-                    return self.rotation[kit][slot] == state
-                case 6:
-                    return self.blending[kit][slot] == state
+        self.slotCount = slotCount
+        self.masks = {}
+
+    def policy(self, kit: str, slot: int, sameGroup: bool) -> int:
+        mask = self.masks[kit][slot]
+        if sameGroup:
+            return (mask | mask >> self.GROUP) & self.ALL
+        return mask & self.ALL
+
+    def getState(self, kit: str, slot: int, option: int) -> int:
+        mask = self.masks[kit][slot]
+        if mask >> option & 1:
+            return 2
+        return mask >> (option + self.GROUP) & 1
+
+    def setState(self, kit: str, slot: int, option: int, state: int):
+        mask = self.masks[kit][slot] & ~(1 << option | 1 << (option + self.GROUP))
+        if state == 2:
+            mask |= 1 << option
+        elif state == 1:
+            mask |= 1 << (option + self.GROUP)
+        self.masks[kit][slot] = mask
+
+    def isStateSame(self, kit: str, slot: int, option: int, state: int):
+        return self.getState(kit, slot, option) == state
 
     def isKitStored(self, kit: str):
-        return all([kit in self.erase, kit in self.size, kit in self.opacity, 
-                    kit in self.flow, kit in self.rotation, kit in self.blending])
+        return kit in self.masks
     
     def newKit(self, kit: str):
-        setting = []
-        for _ in range(10):
-            setting.append(2)
-        self.erase[kit] = setting.copy()
-        self.size[kit] = setting.copy()
-        self.opacity[kit] = setting.copy()
-        self.flow[kit] = setting.copy()
-        self.rotation[kit] = setting.copy()
-        self.blending[kit] = setting.copy()
+        self.masks[kit] = [self.ALL] * self.slotCount
 
     def removeKit(self, kit: str):
-        return [self.erase.pop(kit), self.size.pop(kit), self.opacity.pop(kit), 
-                self.flow.pop(kit), self.rotation.pop(kit), self.blending.pop(kit)]
+        return self.masks.pop(kit)
 
     def renameKit(self, prevName: str, newName: str):
-        settings = self.removeKit(prevName)
-        self.erase[newName] = settings[0]
-        self.size[newName] = settings[1]
-        self.opacity[newName] = settings[2]
-        self.flow[newName] = settings[3]
-        self.rotation[newName] = settings[4]
-        self.blending[newName] = settings[5]
-
-    def changeSettings(self, kit: str, ids, states):
-        for index, id in enumerate(ids):
-            option = id % 7
-            slot = int(((id - option) / 7) - 1)
-            if 0 <= slot <= 9:
-                match option:
-                    case 1:
-                        self.erase[kit][slot] = states[index]
-                    case 2:
-                        self.size[kit][slot] = states[index]
-                    case 3:
-                        self.opacity[kit][slot] = states[index]
-                    case 4:
-                        self.flow[kit][slot] = states[index]
-                    case 5:
-                        self.rotation[kit][slot] = states[index]
-                    case 6:
-                        self.blending[kit][slot] = states[index]
+        self.masks[newName] = self.masks.pop(prevName)
+
+    def changeSettings(self, kit: str, positions, states):
+        for (slot, option), state in zip(positions, states):
+            if 0 <= slot < self.slotCount and 0 <= option < len(self.Options):
+                self.setState(kit, slot, option, state)
 
     def getSettings(self, kit: str):
-        return [self.erase[kit], self.size[kit], self.opacity[kit], 
-                self.flow[kit], self.rotation[kit], self.blending[kit]]
-
-    def getString(self, kit: str):
-        ids = []
-        states = []
-        for index, state in enumerate(self.erase[kit]):
-            if state != 2:
-                ids.append(str((index + 1) * 7 + 1))
-                states.append(str(state))
-        for index, state in enumerate(self.size[kit]):
-            if state != 2:
-                ids.append(str((index + 1) * 7 + 2))
-                states.append(str(state))
-        for index, state in enumerate(self.opacity[kit]):
-            if state != 2:
-                ids.append(str((index + 1) * 7 + 3))
-                states.append(str(state))
-        for index, state in enumerate(self.flow[kit]):
-            if state != 2:
-                ids.append(str((index + 1) * 7 + 4))
-                states.append(str(state))
-        for index, state in enumerate(self.rotation[kit]):
-            if state != 2:
-                ids.append(str((index + 1) * 7 + 5))
-                states.append(str(state))
-        for index, state in enumerate(self.blending[kit]):
-            if state != 2:
-                ids.append(str((index + 1) * 7 + 6))
-                states.append(str(state))
-        return ";".join([",".join(ids), ",".join(states)]) 
+        return [[self.getState(kit, slot, option) for slot in range(self.slotCount)]
+                for option in range(len(self.Options))]
+
+    def getMasks(self, kit: str):
+        return self.masks[kit].copy()
+
+    def setMasks(self, kit: str, masks: list):
+        limit = 1 << (2 * self.GROUP)
+        for slot, mask in enumerate(masks[:self.slotCount]):
+            if type(mask) is int and 0 <= mask < limit:
+                self.masks[kit][slot] = mask
 
 
 class TenBrushSlots(Extension):
@@ -171,61 +352,174 @@ class TenBrushSlots(Extension):
     def __init__(self, parent):
         super().__init__(parent)
 
-        # All presets chosen by user
+        # All presets chosen by user, None for kits not loaded from pending yet
         self.kits = {}
-        # Current kit/slot for switching presets
-        self.activeKit = []
-        self.currentSlot = []
-        # Store parameters to shortcuts
-        self.actions = []
+        # Slots past the slot count as stored, kit to (slots, sync) so lowering the count loses nothing
+        self.extraSlots = {}
+        # Read-only kits shared from a folder, pending as None until their file is parsed
+        self.team = None
+        self.teamFolder = ""
+        self.teamKits = set()
+        # Incremented whenever kits are edited, renamed, removed or reordered
+        self.kitsGeneration = 0
+        self.pending = {}
+        # Preset name to (slot, group, position) for each kit
+        self.kitIndex = {}
+        # Kit to slot index to names not installed, as of the latest finished validation
+        self.missingPresets = {}
+        self.validations = 0
+        # Kits, presets and pending kits as of the latest validation, unchanged ones are not checked again
+        self.validatedState = None
+        # Stamp of Krita's resource database when the preset index was last refreshed
+        self.resourceStamp = None
+        # Name to resource index of installed presets, shared by all windows
+        self.presets = PresetIndex()
+        # Name and tag index for the chooser, tags read from Krita's resource database
+        self.search = PresetSearch()
+        self.resourceCache = None
+        # Preset icons for editor and floating messages
+        self.icons = IconCache()
+        self.messages = FloatingMessage(self.icons)
+        # Main window to its own kit/slot/preset memory and shortcuts
+        self.windows = {}
+        # Action to (window, slot) or (window, cycle) for shortcut handlers
+        self.dispatch = {}
         # Parameters to activate previous preset and next group/position
         self.activatePrev = True
         self.activateNext = True
         self.nextGroup = True
-        self.prevPreset = []
-        self.prevSlot = []
+        # Rapid cycling presses only activate the preset reached at the end
+        self.coalesce = False
+        self.burst = None
+        self.burstTimer = QTimer()
+        self.burstTimer.setSingleShot(True)
+        self.burstTimer.timeout.connect(self.endBurst)
         # Parameters for auto brush tool
         self.autoBrush = True
         self.brushTool = None
+        # Actions are created with each window, a slot count chosen in the editor applies from the next start
+        self.slotCount = LAYER
+        self.nextSlotCount = LAYER
+        self.slotNames = slotNames(LAYER)
         # Sync preset settings when cycling in slot
-        self.sync = SlotSync()
+        self.sync = SlotSync(LAYER)
         # Checks if editor updated slots/settings
-        self.kitsEdited = []
+        self.kitsEdited = set()
         self.updateSettings = False
-        # delay 10ms as closed window yet to be destroyed when signal emitted 
-        self.waitToRemove = QTimer()
-        self.waitToRemove.setSingleShot(True)
-        self.waitToRemove.timeout.connect(self.removeActions)
+        # Kits and options saved as a single file in the resource folder, written off the GUI thread
+        self.storage = None
+        self.saveQueue = None
+        # Kits and options last queued, an unchanged snapshot is not written again
+        self.savedSettings = None
+        # Latest kit/slot/preset of each window by position, restored when windows open
+        self.sessionLog = None
+        self.session = {}
+        self.sessionTimer = QTimer()
+        self.sessionTimer.setSingleShot(True)
+        self.sessionTimer.setInterval(SESSION_DELAY)
+        self.sessionTimer.timeout.connect(self.appendSession)
     
     def setup(self):
+        self.storage = KitStorage()
+        self.saveQueue = SaveQueue(self.storage, self)
+        self.saveQueue.failed.connect(self.saveFailed)
+        self.sessionLog = SessionLog()
+        self.session = self.sessionLog.load()
+        self.resourceCache = ResourceCache()
+        self.resourceStamp = self.resourceCache.stamp()
         self.readSettings()
+        self.team = TeamLibrary()
+        self.team.watcher.directoryChanged.connect(self.updateTeamKits)
+        self.team.watcher.fileChanged.connect(self.reloadTeamKit)
+        self.setTeamLibrary(self.teamFolder)
+        self.validateKits()
         notify = Application.notifier()
         notify.windowCreated.connect(self.newWindow)
         notify.imageClosed.connect(self.resetCurrent)
+        notify.applicationClosing.connect(self.saveQueue.flush)
+        notify.applicationClosing.connect(self.compactSession)
         notify.setActive(True)
 
     def newWindow(self):
-        windows = Application.windows()
-        windows[-1].windowClosed.connect(self.resetPointers)
         self.loadTool()
-        self.resetCurrent()
+        if not self.restoreSession(Application.activeWindow().qwindow()):
+            self.resetCurrent()
 
     def resetCurrent(self):
         if Application.activeWindow().views():
             return
         
         preset = Application.readSetting("", "LastPreset", "")
-        allPresets = Application.resources('preset')
-        if preset in allPresets:
-            window = list(Application.windows()).index(Application.activeWindow())
+        if preset in self.presets:
+            window = self.windows[Application.activeWindow().qwindow()]
             slot = self.findPreset(preset, window)
             if slot is not None:
-                self.currentSlot[window] = slot
+                window.currentSlot = slot
 
-    def resetPointers(self):
-        if Application.windows():
-            self.loadTool()
-            self.waitToRemove.start(10)
+    def restoreSession(self, qwindow):
+        position = list(self.windows).index(qwindow)
+        record = self.session.get(position)
+        if record is None or record.get("kit") not in self.kits:
+            return False
+        
+        # Stored locations are used as they are, only checked to still be in the kit
+        window = self.windows[qwindow]
+        kit = record["kit"]
+        slots = self.getKit(kit)
+        window.kit = kit
+        for index, action in enumerate(window.actions[:self.slotCount]):
+            action.preset = self.slotPreset(slots[index])
+
+        current = self.sessionPreset(slots, record.get("slot"), record.get("group"), record.get("position"))
+        if current is not None:
+            window.currentSlot = record["slot"]
+            window.actions[window.currentSlot].preset = current
+        prev = self.sessionPreset(slots, record.get("prevSlot"), record.get("prevGroup"), record.get("prevPosition"))
+        if prev is not None:
+            window.prevSlot = record["prevSlot"]
+            if window.prevSlot != window.currentSlot:
+                window.actions[window.prevSlot].preset = prev
+        if record.get("prevPreset"):
+            window.prevPreset = self.presets.get(record["prevPreset"])
+        return True
+
+    def sessionPreset(self, slots: list, slot, group, position):
+        for value in (slot, group, position):
+            if type(value) is not int or value < 0:
+                return
+        if slot < len(slots) and group < len(slots[slot]) and position < len(slots[slot][group]):
+            return ActionPreset(group, slots[slot][group][position])
+
+    def sessionRecord(self, window: WindowState, position: int):
+        record = {"window": position, "kit": window.kit, "slot": window.currentSlot, "prevSlot": window.prevSlot}
+        index = self.kitIndex.get(window.kit, {})
+        preset = window.actions[window.currentSlot].preset
+        location = index.get(preset.name) if preset is not None else None
+        if location is not None and location[0] == window.currentSlot:
+            record["group"], record["position"] = location[1:]
+        
+        if window.prevPreset is not None:
+            record["prevPreset"] = window.prevPreset.name()
+            location = index.get(record["prevPreset"])
+            if location is not None and location[0] == window.prevSlot:
+                record["prevGroup"], record["prevPosition"] = location[1:]
+        return record
+
+    def appendSession(self):
+        # Only windows that moved since their last record are appended
+        records = []
+        for position, window in enumerate(self.windows.values()):
+            record = self.sessionRecord(window, position)
+            if self.session.get(position) != record:
+                self.session[position] = record
+                records.append(record)
+        self.sessionLog.append(records)
+
+    def compactSession(self):
+        self.sessionTimer.stop()
+        for position, window in enumerate(self.windows.values()):
+            self.session[position] = self.sessionRecord(window, position)
+        self.sessionLog.compact([self.session[position] for position in sorted(self.session)])
 
     def loadTool(self):    
         toolBox = Application.activeWindow().qwindow().findChild(QDockWidget, 'ToolBox')
@@ -233,161 +527,408 @@ class TenBrushSlots(Extension):
 
     def createActions(self, window):
         action = window.createAction(EXTENSION_ID, MENU_ENTRY, "tools/scripts")
-        action.setToolTip(i18n("Assign brush presets to ten configurable slots."))
+        action.setToolTip(i18n("Assign brush presets to configurable slots."))
         action.triggered.connect(self.openEditor)
+        action = window.createAction(EXPORT_ID, EXPORT_ENTRY, "tools/scripts")
+        action.setToolTip(i18n("Save timings of brush slot shortcuts to a file."))
+        action.triggered.connect(self.exportLatency)
         self.loadActions(window)
 
     def openEditor(self):
-        window = list(Application.windows()).index(Application.activeWindow())
-        mainDialog = SlotEditor(MENU_ENTRY, window, self)
-        mainDialog.exec()
+        self.flushBurst()
+        qwindow = Application.activeWindow().qwindow()
+        window = self.windows[qwindow]
+        # Time taken until the editor shows, not while it is open
+        with LATENCY.measure("openEditor"):
+            # Editor is where new bundles and renames are likely noticed, rebuild index if the database changed
+            stamp = self.resourceCache.stamp()
+            if stamp is None or stamp != self.resourceStamp:
+                self.resourceStamp = stamp
+                self.presets.refresh()
+            self.validateKits()
+            if window.editor is None:
+                window.editor = SlotEditor(MENU_ENTRY, window, self, qwindow)
+            else:
+                window.editor.refresh()
+        window.editor.exec()
         if self.updateSettings or self.kitsEdited:
             self.writeSettings()
             self.updateSettings = False
-            self.kitsEdited = []
+            self.kitsEdited = set()
+
+    def indexKit(self, kit: str):
+        index = {}
+        for slot, groups in enumerate(self.kits[kit]):
+            for group, names in enumerate(groups):
+                for position, name in enumerate(names):
+                    index.setdefault(name, (slot, group, position))
+        self.kitIndex[kit] = index
+
+    def exportLatency(self):
+        path = os.path.join(Application.getAppDataLocation(), "tenbrushslots-latency.txt")
+        path, _ = QFileDialog.getSaveFileName(Application.activeWindow().qwindow(), EXPORT_ENTRY, 
+                                              path, i18n("Text Files (*.txt)"))
+        if path:
+            LATENCY.export(path)
 
     def reorderKits(self, kitOrder: list):
         orderedKits = {}
         for kit in kitOrder:
-            orderedKits[kit] = self.kits.pop(kit)
+            if kit in self.kits:
+                orderedKits[kit] = self.kits.pop(kit)
+        # Kits added while the editor was open, like new team kits, stay at the end
+        orderedKits.update(self.kits)
         self.kits = orderedKits
+        self.kitsGeneration += 1
         self.updateSettings = True
 
     def updateName(self, prevName: str, newName: str):
         self.kits[newName] = self.kits.pop(prevName)
-        for index, kit in enumerate(self.activeKit):
-            if kit == prevName:
-                self.activeKit[index] = newName
+        if prevName in self.pending:
+            self.pending[newName] = self.pending.pop(prevName)
+        else:
+            self.kitIndex[newName] = self.kitIndex.pop(prevName)
+        for window in self.windows.values():
+            if window.kit == prevName:
+                window.kit = newName
         if prevName in self.kitsEdited:
             self.kitsEdited.remove(prevName)
-            self.kitsEdited.append(newName)
+            self.kitsEdited.add(newName)
+        if prevName in self.extraSlots:
+            self.extraSlots[newName] = self.extraSlots.pop(prevName)
+        self.kitsGeneration += 1
         self.updateSettings = True
 
     def updateKit(self, kit: str, slots: list):
+        if kit in self.kits:
+            # Pending kits are loaded first for their sync settings
+            self.getKit(kit)
+        self.kitsEdited.add(kit)
         self.kits[kit] = slots
-        if kit not in self.kitsEdited:
-            self.kitsEdited.append(kit)
+        self.indexKit(kit)
+        self.kitsGeneration += 1
 
     def removeKit(self, kit: str):
+        self.kitsGeneration += 1
         if kit in self.kits:
             self.kits.pop(kit)
+            self.kitIndex.pop(kit, None)
+            self.pending.pop(kit, None)
+            self.extraSlots.pop(kit, None)
             self.updateSettings = True
+        if self.sync.isKitStored(kit):
+            self.sync.removeKit(kit)
 
-        if not self.kits:
+        # Team kits are read-only, an empty personal kit is kept to edit and sync
+        if all(kit in self.teamKits for kit in self.kits):
             kit = ""
-            self.kits[kit] = []
-            if kit not in self.kitsEdited:
-                self.kitsEdited.append(kit)
+            self.kits[kit] = [[] for _ in range(self.slotCount)]
+            self.kitIndex[kit] = {}
+            self.sync.newKit(kit)
+            self.kitsEdited.add(kit)
+            return True
+        return False
     
-    def setActiveKit(self, kit: str, window: int):
-        self.activeKit[window] = kit
+    @LATENCY.timed("setActiveKit")
+    def setActiveKit(self, kit: str, window: WindowState):
+        slots = self.getKit(kit)
+        window.kit = kit
 
         preset = Application.readSetting("", "LastPreset", "")
         view = Application.activeWindow().activeView()
-        if view.visible():
+        if view is not None and view.visible():
             preset = view.currentBrushPreset().name()
 
         currentSlot = None
-        allPresets = Application.resources('preset')
-        if preset in allPresets:
+        if preset in self.presets:
             currentSlot = self.findPreset(preset, window)
             if currentSlot is not None:
-                self.currentSlot[window] = currentSlot
+                window.currentSlot = currentSlot
 
         prevSlot = None
-        if self.prevPreset[window]:
-            preset = self.prevPreset[window].name()
-            if preset in allPresets:
+        if window.prevPreset:
+            preset = window.prevPreset.name()
+            if preset in self.presets:
                 prevSlot = self.findPreset(preset, window, currentSlot)
                 if prevSlot is not None:
-                    self.prevSlot[window] = prevSlot
+                    window.prevSlot = prevSlot
 
-        start = window * ACTIONS
-        for index, action in enumerate(self.actions[start:start+len(SLOTS)]):
+        for index, action in enumerate(window.actions[:self.slotCount]):
             if index == currentSlot or index == prevSlot:
                 continue
-            
-            if self.kits[kit][index]:
-                action.preset = ActionPreset(0, self.kits[kit][index][0][0])
-            else:
-                action.preset = None
+            action.preset = self.slotPreset(slots[index])
 
-    def findPreset(self, presetName: str, window: int, currentSlot=None):
+        self.sessionTimer.start()
+
+    def slotPreset(self, slot: list):
+        # First installed preset of the slot, a placeholder only when none of them are installed
+        for group, names in enumerate(slot):
+            for name in names:
+                if self.presets.has(name):
+                    return ActionPreset(group, name)
+        if slot:
+            return ActionPreset(0, slot[0][0])
+
+    def findPreset(self, presetName: str, window: WindowState, currentSlot=None):
         presetSlot = None
-        presetGroup = 0
-        for index, slot in enumerate(self.kits[self.activeKit[window]]):
-            if presetSlot is not None:
-                    break
-
-            for idx, group in enumerate(slot):
-                if presetName in group:
-                    presetSlot = index
-                    presetGroup = idx
-                    break
+        location = self.kitIndex[window.kit].get(presetName)
+        if location is not None:
+            presetSlot, presetGroup, _ = location
         if presetSlot is not None and presetSlot != currentSlot:
-            self.actions[presetSlot + window*ACTIONS].preset = ActionPreset(presetGroup, presetName)
+            window.actions[presetSlot].preset = ActionPreset(presetGroup, presetName)
         return presetSlot
     
     def readSettings(self):
-        allPresets = Application.resources('preset')
+        self.presets.build()
+        if not self.storage.exists():
+            data = self.readLegacySettings()
+            # One-time migration of kits stored in kritarc by earlier versions
+            if data["kits"][0]["name"] or any(data["kits"][0]["slots"]):
+                self.saveQueue.save(data)
+        else:
+            data = self.storage.load()
+            if data is None:
+                # Migrating again would bring back kits from before the file, start empty instead
+                data = {"kits": []}
+                QMessageBox.warning(None, MENU_ENTRY, i18n(f"Kits could not be read from {self.storage.path}, "
+                                                           f"it was kept as {self.storage.path}.bak."))
+        self.loadSettings(data)
+
+    def loadSettings(self, data: dict):
+        # Needed before any kit is loaded, kits are padded or cut to it
+        options = data.get("options")
+        if type(options) is not dict:
+            options = {}
+        count = options.get("slotCount")
+        if type(count) is int:
+            self.slotCount = self.nextSlotCount = min(max(count, LAYER), MAX_SLOTS)
+            self.slotNames = slotNames(self.slotCount)
+            self.sync.slotCount = self.slotCount
+
+        # Only names are known until a kit is first used, see getKit
+        for entry in data["kits"]:
+            if not isKit(entry):
+                continue
+            self.kits[entry["name"]] = None
+            self.pending[entry["name"]] = entry
+
+        if self.kits:
+            self.loadKit(next(iter(self.kits)))
+        else:
+            self.kits[""] = [[] for _ in range(self.slotCount)]
+            self.indexKit("")
+            self.sync.newKit("")
+
+        self.activatePrev = options.get("activatePrev", self.activatePrev)
+        self.activateNext = options.get("activateNext", self.activateNext)
+        self.nextGroup = options.get("nextGroup", self.nextGroup)
+        self.autoBrush = options.get("autoBrush", self.autoBrush)
+        self.coalesce = options.get("coalesce", self.coalesce)
+        self.sync.active = options.get("sync", self.sync.active)
+        self.teamFolder = options.get("teamLibrary", self.teamFolder)
+
+    def loadKit(self, kit: str):
+        entry = self.pending.pop(kit)
+        if entry is None:
+            entry = self.team.read(kit)
+        slots = []
+        # Presets not installed are kept as placeholders, see validateKits
+        for slot in entry["slots"][:self.slotCount]:
+            slots.append([list(group) for group in slot if group])
+        while len(slots) < self.slotCount:
+            slots.append([])
+        if len(entry["slots"]) > self.slotCount:
+            self.extraSlots[kit] = (entry["slots"][self.slotCount:], entry.get("sync", [])[self.slotCount:])
+
+        self.kits[kit] = slots
+        self.indexKit(kit)
+        self.sync.newKit(kit)
+        if "sync" in entry:
+            self.sync.setMasks(kit, entry["sync"])
+        return slots
+
+    def validateKits(self):
+        # Slot lists are replaced when kits are edited, never changed in place, so the thread can share them
+        kits = {}
+        for kit, slots in self.kits.items():
+            if kit not in self.pending:
+                kits[kit] = slots
+            elif self.pending[kit] is not None:
+                kits[kit] = self.pending[kit]["slots"]
+        names = self.presets.frozenNames()
+        state = (self.kitsGeneration, self.presets.generation, len(kits))
+        if state == self.validatedState:
+            return
+        self.validatedState = state
+        self.validations += 1
+        validator = KitValidator(self.validations, kits, names, self.slotCount, self)
+        validator.validated.connect(self.setMissing)
+        validator.finished.connect(validator.deleteLater)
+        validator.start()
+
+    def setMissing(self, number: int, missing: dict):
+        # Ignore runs started before the latest one
+        if number != self.validations:
+            return
+        self.missingPresets = missing
+        for slots in missing.values():
+            for names in slots.values():
+                self.presets.markMissing(names)
+        for window in self.windows.values():
+            if window.editor is not None:
+                window.editor.showMissing()
+
+    def setTeamLibrary(self, folder: str):
+        self.teamFolder = folder
+        self.team.setFolder(folder or os.environ.get(ENVIRONMENT, ""))
+        self.updateTeamKits()
+
+    def updateTeamKits(self):
+        added, removed = self.team.update()
+        for kit in removed:
+            if kit not in self.teamKits:
+                continue
+            self.teamKits.discard(kit)
+            self.kits.pop(kit)
+            self.kitIndex.pop(kit, None)
+            self.pending.pop(kit, None)
+            if self.sync.isKitStored(kit):
+                self.sync.removeKit(kit)
+        for kit in added:
+            # Personal kit of the same name is kept instead
+            if kit not in self.kits:
+                self.teamKits.add(kit)
+                self.kits[kit] = None
+                self.pending[kit] = None
+        
+        if added or removed:
+            self.kitsGeneration += 1
+            for qwindow, window in self.windows.items():
+                if window.kit not in self.kits:
+                    self.retargetKit(next(iter(self.kits)), qwindow, window)
+
+    def reloadTeamKit(self, path: str):
+        kit = self.team.kitName(path)
+        if kit not in self.teamKits or self.team.files.get(kit) != path:
+            return
+        
+        self.team.watch(path)
+        if kit in self.pending:
+            return
+        # Parsed again when next used, windows using it are updated now
+        self.kits[kit] = None
+        self.pending[kit] = None
+        self.kitIndex.pop(kit, None)
+        self.kitsGeneration += 1
+        for qwindow, window in self.windows.items():
+            if window.kit == kit:
+                self.retargetKit(kit, qwindow, window)
+
+    def retargetKit(self, kit: str, qwindow, window: WindowState):
+        # Team library changes arrive at any time, only the active window's brush is known
+        active = Application.activeWindow()
+        if active is not None and active.qwindow() == qwindow:
+            self.setActiveKit(kit, window)
+            return
+        
+        slots = self.getKit(kit)
+        window.kit = kit
+        window.neighbours = None
+        for index, action in enumerate(window.actions[:self.slotCount]):
+            action.preset = self.slotPreset(slots[index])
+        self.sessionTimer.start()
+
+    def getKit(self, kit: str):
+        if kit in self.pending:
+            return self.loadKit(kit)
+        return self.kits[kit]
+
+    def readLegacySettings(self):
+        # Layout before version 1, kits joined by commas and slots by semicolons
+        data = {"kits": []}
+        legacy = SlotSync(LAYER)
         kits = Application.readSetting(MENU_ENTRY, "kits", "").split(",")
         for index, kit in enumerate(kits):
-            self.kits[kit] = []
-
+            slots = []
             for number in SLOTS:
                 slot = Application.readSetting(MENU_ENTRY, f"{index}slot{number}", "").split(";")
+                slot = [[name for name in string.split(",") if name] for string in slot]
+                slots.append([group for group in slot if group])
 
-                for idx, string in enumerate(slot):
-                    slot[idx] = [name for name in string.split(",") if name in allPresets]
-                
-                slot = [group for group in slot if group]
-                self.kits[kit].append(slot)
-
-            self.sync.newKit(kit)
+            legacy.newKit(kit)
             sync = Application.readSetting(MENU_ENTRY, f"{index}sync", "").split(";")
             if len(sync) == 2:
                 ids = [int(id) for id in sync[0].split(",") if id.isdecimal()]
                 states = [int(state) for state in sync[1].split(",") if state == "0" or state == "1"]
                 if len(ids) == len(states):
-                    self.sync.changeSettings(kit, ids, states)
+                    # Ids were grid positions, 7 per slot column with row 0 for headers
+                    positions = [(id // 7 - 1, id % 7 - 1) for id in ids]
+                    legacy.changeSettings(kit, positions, states)
+            data["kits"].append({"name": kit, "slots": slots, "sync": legacy.getMasks(kit)})
 
         options = Application.readSetting(MENU_ENTRY, "options", "").split(",")
         if len(options) == 5:
-            self.activatePrev = options[0] == "True"
-            self.activateNext = options[1] == "True"
-            self.nextGroup = options[2] == "True"
-            self.autoBrush = options[3] == "True"
-            self.sync.active = options[4] == "True"
+            data["options"] = {"activatePrev": options[0] == "True",
+                               "activateNext": options[1] == "True",
+                               "nextGroup": options[2] == "True",
+                               "autoBrush": options[3] == "True",
+                               "sync": options[4] == "True"}
+        return data
 
     def writeSettings(self):
-        kits = list(self.kits.keys())
-        Application.writeSetting(MENU_ENTRY, "kits", ",".join(kits))
-
-        for index, kit in enumerate(self.kits):
-            for idx, number in enumerate(SLOTS):
-                slot = [",".join(group) for group in self.kits[kit][idx]]
-                Application.writeSetting(MENU_ENTRY, f"{index}slot{number}", ";".join(slot))
-
-            Application.writeSetting(MENU_ENTRY, f"{index}sync", self.sync.getString(kit))
-
-        options = []
-        options.append(str(self.activatePrev))
-        options.append(str(self.activateNext))
-        options.append(str(self.nextGroup))
-        options.append(str(self.autoBrush))
-        options.append(str(self.sync.active))
-        Application.writeSetting(MENU_ENTRY, "options", ",".join(options))
+        kits = []
+        for kit, slots in self.kits.items():
+            if kit in self.teamKits:
+                continue
+            elif kit in self.pending:
+                # Never loaded so nothing changed, store as read
+                kits.append(dict(self.pending[kit], name=kit))
+            else:
+                sync = self.sync.getMasks(kit)
+                if kit in self.extraSlots:
+                    extraSlots, extraSync = self.extraSlots[kit]
+                    slots, sync = slots + extraSlots, sync + extraSync
+                kits.append({"name": kit, "slots": slots, "sync": sync})
+
+        options = {"activatePrev": self.activatePrev,
+                   "activateNext": self.activateNext,
+                   "nextGroup": self.nextGroup,
+                   "autoBrush": self.autoBrush,
+                   "coalesce": self.coalesce,
+                   "sync": self.sync.active,
+                   "teamLibrary": self.teamFolder,
+                   "slotCount": self.nextSlotCount}
+        # Slot lists are replaced on edit, never changed in place, so the snapshot is not copied
+        if (kits, options) == self.savedSettings:
+            return
+        self.savedSettings = (kits, options)
+        self.saveQueue.save({"kits": kits, "options": options})
+    
+    def saveFailed(self, error: str):
+        # Reported when it happens, kits stay in memory and the next save tries again
+        self.savedSettings = None
+        window = Application.activeWindow()
+        QMessageBox.warning(window.qwindow() if window is not None else None, MENU_ENTRY,
+                            i18n(f"Kits could not be saved to {self.storage.path}.\n\n{error}"))
     
     def loadActions(self, window):
-        kit = list(self.kits.keys())[0]
-        for index, number in enumerate(SLOTS):
-            action = window.createAction(f"activate_slot_{number}", i18n(f"Activate Brush Slot {number}"), "")
+        kit = next(iter(self.kits))
+        slots = self.getKit(kit)
+        # Each window to have their own kit/slot/preset memory
+        state = WindowState(kit)
+        qwindow = window.qwindow()
+        self.windows[qwindow] = state
+        # Only this window's state is dropped, once its actions are gone with it
+        qwindow.destroyed.connect(partial(self.removeWindow, qwindow))
+
+        for index, number in enumerate(self.slotNames):
+            action = window.createAction(f"activate_slot_{number.replace('-', '_')}", 
+                                         i18n(f"Activate Brush Slot {number}"), "")
             action.triggered.connect(self.activateSlot)
 
-            action.preset = None
-            if self.kits[kit][index]:
-                action.preset = ActionPreset(0, self.kits[kit][index][0][0])
-            self.actions.append(action)
+            action.preset = self.slotPreset(slots[index])
+            state.actions.append(action)
+            self.dispatch[action] = (state, index)
 
         for order in ActionCycle.Orders:
             for move in ActionCycle.Moves:
@@ -395,162 +936,148 @@ class TenBrushSlots(Extension):
                                              i18n(f"Switch To {move.capitalize()} {order.capitalize()}"), "")
                 action.triggered.connect(self.switchPreset)
 
-                action.cycle = ActionCycle(order, move)
-                self.actions.append(action)
-        
-        # Each window to have their own kit/slot/preset memory
-        self.activeKit.append(kit)
-        self.currentSlot.append(0)
-        self.prevSlot.append(0)
-        self.prevPreset.append(None)
-
-    def removeActions(self):
-        removing = []
-        for index, action in enumerate(self.actions):
-                try:
-                    action.parent()
-                except RuntimeError:
-                    removing.append(index)
-        for id in reversed(removing):
-            self.actions.pop(id)
+                state.actions.append(action)
+                self.dispatch[action] = (state, ActionCycle(order, move))
+
+    def removeWindow(self, qwindow):
+        state = self.windows.pop(qwindow, None)
+        if state is None:
+            return
         
-        # Remove kit/slot/preset memory of closed windows
-        for id in reversed(removing[::ACTIONS]):
-            window = int(id / ACTIONS)
-            self.activeKit.pop(window)
-            self.currentSlot.pop(window)
-            self.prevSlot.pop(window)
-            self.prevPreset.pop(window)
+        for action in state.actions:
+            self.dispatch.pop(action, None)
+        state.actions = []
+        state.neighbours = None
+        # Deleted along with its parent window
+        state.editor = None
+        if self.burst is not None and self.burst.window is state:
+            self.burstTimer.stop()
+            self.burst = None
+
+        # Brush tool button may have belonged to the closed window
+        if Application.windows():
+            self.loadTool()
 
+    @LATENCY.timed("activateSlot")
     def activateSlot(self):
         view = Application.activeWindow().activeView()
         if not view.visible():
             return
         
-        window = int(self.actions.index(self.sender()) / ACTIONS)
-        preset: ActionPreset = self.sender().preset
+        window, slot = self.dispatch[self.sender()]
+        if self.burst is not None:
+            order = 'group' if self.nextGroup else 'position'
+            if self.activateNext and self.extendBurst(window, slot, order, ActionCycle.Value):
+                return
+            self.flushBurst()
+
+        preset: ActionPreset = window.actions[slot].preset
         if preset is None:
             self.showMessage(view, window, 'empty')
             return
             
-        allPresets = Application.resources('preset')
-        if preset.name not in allPresets:
+        resource = self.presets.get(preset.name)
+        if resource is None:
             self.showMessage(view, window, 'missing')
             return
 
-        # Multiple windows will append another set of actions to the list
-        slot = self.actions.index(self.sender()) % ACTIONS
         currentPreset = view.currentBrushPreset()
         if preset.name == currentPreset.name() and (not self.autoBrush or self.brushTool.isChecked()):
-            kit = self.activeKit[window]
+            kit = window.kit
             if self.activateNext and self.nextGroup and len(self.kits[kit][slot]) > 1:
-                self.currentSlot[window] = slot
-                if not self.cycleGroup(view, allPresets, preset, ActionCycle.Value, window):
+                window.currentSlot = slot
+                if not self.cycleGroup(view, preset, ActionCycle.Value, window):
                     self.showMessage(view, window, 'missing')
                     return
             elif self.activateNext and (not self.nextGroup and 
                                         len(self.kits[kit][slot][preset.group]) > 1):
-                self.currentSlot[window] = slot
-                if not self.cyclePosition(view, allPresets, preset, ActionCycle.Value, window):
+                window.currentSlot = slot
+                if not self.cyclePosition(view, preset, ActionCycle.Value, window):
                     self.showMessage(view, window, 'missing')
                     return
-            elif self.activatePrev and self.prevPreset[window] is not None:
+            elif self.activatePrev and window.prevPreset is not None:
                 synced = False
-                prevName = self.prevPreset[window].name()
-                if self.currentSlot[window] != self.prevSlot[window]:
-                    if slot == self.currentSlot[window]:
-                        for group in self.kits[kit][self.prevSlot[window]]:
-                            if prevName in group:
-                                self.currentSlot[window] = self.prevSlot[window]
-                                self.prevSlot[window] = slot
-                                break
-                    else:
-                        for group in self.kits[kit][self.currentSlot[window]]:
-                            if prevName in group:
-                                self.prevSlot[window] = slot
-                                break
-                else:
-                    for index, group in enumerate(self.kits[kit][slot]):
-                        if prevName in group:
-                            self.actions[slot + window*ACTIONS].preset = ActionPreset(index, prevName)
-                            synced = self.activateAndSync(view, allPresets, prevName, window, index == preset.group)
-                            break
+                prevName = window.prevPreset.name()
+                location = self.kitIndex[kit].get(prevName)
+                prevIn = location[0] if location is not None else None
+                if window.currentSlot != window.prevSlot:
+                    if slot == window.currentSlot:
+                        if prevIn == window.prevSlot:
+                            window.currentSlot = window.prevSlot
+                            window.prevSlot = slot
+                    elif prevIn == window.currentSlot:
+                        window.prevSlot = slot
+                elif prevIn == slot:
+                    index = location[1]
+                    window.actions[slot].preset = ActionPreset(index, prevName)
+                    synced = self.activateAndSync(view, prevName, window, index == preset.group)
                 if not synced:
-                    view.activateResource(self.prevPreset[window])
-                self.prevPreset[window] = currentPreset
+                    view.activateResource(window.prevPreset)
+                window.prevPreset = currentPreset
         else:
             if preset.name != currentPreset.name():
-                self.prevPreset[window] = currentPreset
-                self.prevSlot[window] = self.currentSlot[window]
-            self.currentSlot[window] = slot
-            view.activateResource(allPresets[preset.name])
+                window.prevPreset = currentPreset
+                window.prevSlot = window.currentSlot
+            window.currentSlot = slot
+            view.activateResource(resource)
 
         if self.autoBrush:
             Application.action('KritaShape/KisToolBrush').trigger()
         self.showMessage(view, window, 'selected')
+        # Resolve likely next presses once this one has returned to the event loop
+        QTimer.singleShot(0, lambda: self.prefetchNeighbours(window))
+        self.sessionTimer.start()
     
-    def showMessage(self, view, window: int, message: str):
-        kit = self.activeKit[window]
-        activePreset = view.currentBrushPreset()
-
-        if message == 'selected':
-            view.showFloatingMessage(i18n("{}\nselected")
-                                     .format(f"{kit}: {activePreset.name()}" if kit else activePreset.name()), 
-                                     QIcon(QPixmap.fromImage(activePreset.image())), TIME, 1)
-        elif message == 'missing':
-            view.showFloatingMessage(i18n("{}Missing Preset").format(f"{kit}: " if kit else ""), 
-                                     Application.icon('warning'), TIME, 1)
-        elif message == 'empty':
-            view.showFloatingMessage(i18n("{}Empty Slot").format(f"{kit}: " if kit else ""), 
-                                     Application.icon('warning'), TIME, 1)
-        elif message == 'kit':
-            view.showFloatingMessage(i18n("{}Kit\nselected").format(f"{kit} " if kit else ""), 
-                                     Application.icon('krita_tool_freehand'), TIME, 1)
+    def showMessage(self, view, window: WindowState, message: str):
+        self.messages.show(view, window.kit, message)
 
+    @LATENCY.timed("switchPreset")
     def switchPreset(self):
         view = Application.activeWindow().activeView()
         if not view.visible():
             return
         
-        window = int(self.actions.index(self.sender()) / ACTIONS)
-        cycle = self.sender().cycle
+        window, cycle = self.dispatch[self.sender()]
+        if self.burst is not None:
+            if cycle.order != 'kit' and self.extendBurst(window, window.currentSlot, cycle.order, cycle.vector):
+                return
+            self.flushBurst()
+
         if cycle.order == 'kit':
             if len(self.kits) > 1:
                 self.cycleKit(cycle.vector, window)
                 self.showMessage(view, window, 'kit')
             return
 
-        currentSlot = self.currentSlot[window]
-        preset: ActionPreset = self.actions[currentSlot + window*ACTIONS].preset
+        currentSlot = window.currentSlot
+        preset: ActionPreset = window.actions[currentSlot].preset
+        currentPreset = view.currentBrushPreset()
         changed = False
-        if preset is None:
+        if preset is None or preset.name != currentPreset.name():
             currentSlot = self.findPreset(currentPreset.name(), window)
             changed = True
-        else:
-            currentPreset = view.currentBrushPreset()
-            if preset.name != currentPreset.name():
-                currentSlot = self.findPreset(currentPreset.name(), window)
-                changed = True
 
         if currentSlot is not None:
             if changed:
-                preset = self.actions[currentSlot + window*ACTIONS].preset
-                self.currentSlot[window] = currentSlot
+                preset = window.actions[currentSlot].preset
+                window.currentSlot = currentSlot
             
-            allPresets = Application.resources('preset')
-            slot = self.kits[self.activeKit[window]][currentSlot]
+            slot = self.kits[window.kit][currentSlot]
             if cycle.order == 'group' and len(slot) > 1:
-                if not self.cycleGroup(view, allPresets, preset, cycle.vector, window):
+                if not self.cycleGroup(view, preset, cycle.vector, window):
                     self.showMessage(view, window, 'missing')
                     return
             elif cycle.order == 'position' and len(slot[preset.group]) > 1:
-                if not self.cyclePosition(view, allPresets, preset, cycle.vector, window):
+                if not self.cyclePosition(view, preset, cycle.vector, window):
                     self.showMessage(view, window, 'missing')
                     return
 
         if self.autoBrush:
             Application.action('KritaShape/KisToolBrush').trigger()
         self.showMessage(view, window, 'selected')
+        # Resolve likely next presses once this one has returned to the event loop
+        QTimer.singleShot(0, lambda: self.prefetchNeighbours(window))
+        self.sessionTimer.start()
 
     def getDestination(self, start: int, length: int, vector: int):
         destination = start + vector
@@ -561,81 +1088,173 @@ class TenBrushSlots(Extension):
                 destination = destination - length
         return destination
 
-    def cycleKit(self, vector: int, window: int):
+    def cycleKit(self, vector: int, window: WindowState):
         kits = list(self.kits.keys())
-        index = kits.index(self.activeKit[window])
+        index = kits.index(window.kit)
         destination = self.getDestination(index, len(kits), vector)
         self.setActiveKit(kits[destination], window)
     
-    def cycleGroup(self, view, allPresets: dict, preset: ActionPreset, vector: int, window: int):
-        currentSlot = self.currentSlot[window]
-        slot = self.kits[self.activeKit[window]][currentSlot]
-        if not slot or preset.group >= len(slot):
-            return
+    def cycleGroup(self, view, preset: ActionPreset, vector: int, window: WindowState):
+        return self.cycleSlot(view, preset, 'group', vector, window)
+
+    def cyclePosition(self, view, preset: ActionPreset, vector: int, window: WindowState):
+        return self.cycleSlot(view, preset, 'position', vector, window)
+
+    def cycleSlot(self, view, preset: ActionPreset, order: str, vector: int, window: WindowState):
+        kit = window.kit
+        currentSlot = window.currentSlot
+        target = None
+        if window.neighbours is not None:
+            target = window.neighbours.get(kit, currentSlot, preset, self.kitIndex[kit], 
+                                           self.presets.generation, order, vector)
+        if target is None:
+            target = self.findNeighbour(kit, currentSlot, preset, order, vector)
+
+        if target is not None and target[2] is not None:
+            group, presetName, resource = target
+            window.actions[currentSlot].preset = ActionPreset(group, presetName)
+            window.prevPreset = view.currentBrushPreset()
+            window.prevSlot = currentSlot
+            synced = self.activateAndSync(view, presetName, window, order == 'position', resource)
+            if self.coalesce:
+                self.burst = Burst(window, currentSlot, ActionPreset(group, presetName), order == 'position')
+                self.burstTimer.start(COALESCE)
+            return synced
+
+    def extendBurst(self, window: WindowState, slot: int, order: str, vector: int):
+        burst = self.burst
+        if burst.window is not window or burst.slot != slot:
+            return False
+        
+        kit = window.kit
+        groups = self.kits[kit][slot]
+        if (order == 'group' and len(groups) < 2) or (order == 'position' and len(groups[burst.preset.group]) < 2):
+            return False
+
+        # Only plugin state is read until the burst ends
+        target = self.findNeighbour(kit, slot, burst.preset, order, vector)
+        if target is None or target[2] is None:
+            return False
         
-        try:
-            position = slot[preset.group].index(preset.name)
-        except ValueError:
+        burst.preset = ActionPreset(target[0], target[1])
+        burst.target = target
+        burst.sameGroup = burst.sameGroup and order == 'position'
+        self.burstTimer.start(COALESCE)
+        return True
+
+    def flushBurst(self):
+        self.burstTimer.stop()
+        self.endBurst()
+
+    def endBurst(self):
+        burst = self.burst
+        self.burst = None
+        if burst is None or burst.target is None:
             return
         
-        destination = self.getDestination(preset.group, len(slot), vector)
-        if position >= len(slot[destination]):
-            position = 0
-
-        presetName = slot[destination][position]
-        if presetName in allPresets:
-            self.actions[currentSlot + window*ACTIONS].preset = ActionPreset(destination, presetName)
-            self.prevPreset[window] = view.currentBrushPreset()
-            self.prevSlot[window] = currentSlot
-            return self.activateAndSync(view, allPresets, presetName, window)
-
-    def cyclePosition(self, view, allPresets: dict, preset: ActionPreset, vector: int, window: int):
-        currentSlot = self.currentSlot[window]
-        slot = self.kits[self.activeKit[window]][currentSlot]
+        view = Application.activeWindow().activeView()
+        if not view.visible():
+            return
+
+        window = burst.window
+        group, presetName, resource = burst.target
+        window.actions[burst.slot].preset = ActionPreset(group, presetName)
+        window.prevPreset = view.currentBrushPreset()
+        window.prevSlot = burst.slot
+        self.activateAndSync(view, presetName, window, burst.sameGroup, resource)
+
+        if self.autoBrush:
+            Application.action('KritaShape/KisToolBrush').trigger()
+        self.showMessage(view, window, 'selected')
+        QTimer.singleShot(0, lambda: self.prefetchNeighbours(window))
+        self.sessionTimer.start()
+
+    def findNeighbour(self, kit: str, currentSlot: int, preset: ActionPreset, order: str, vector: int):
+        slot = self.kits[kit][currentSlot]
         if not slot or preset.group >= len(slot):
             return
         
-        group = slot[preset.group]
-        try:
-            position = group.index(preset.name)
-        except ValueError:
+        location = self.kitIndex[kit].get(preset.name)
+        if location is None or location[:2] != (currentSlot, preset.group):
+            return
+        
+        position = location[2]
+        group = preset.group
+        # Placeholders of presets not installed are stepped over
+        for _ in range(len(slot) if order == 'group' else len(slot[group])):
+            if order == 'group':
+                group = self.getDestination(group, len(slot), vector)
+                index = position if position < len(slot[group]) else 0
+            else:
+                position = self.getDestination(position, len(slot[group]), vector)
+                index = position
+
+            presetName = slot[group][index]
+            resource = self.presets.get(presetName)
+            if resource is not None:
+                break
+        return group, presetName, resource
+
+    def prefetchNeighbours(self, window: WindowState):
+        if not window.actions:
+            # Closed before the event loop came back
+            return
+
+        kit = window.kit
+        currentSlot = window.currentSlot
+        preset = window.actions[currentSlot].preset
+        if preset is None:
+            window.neighbours = None
             return
 
-        destination = self.getDestination(position, len(group), vector)
-        presetName = group[destination]
-        if presetName in allPresets:
-            self.actions[currentSlot + window*ACTIONS].preset = ActionPreset(preset.group, presetName)
-            self.prevPreset[window] = view.currentBrushPreset()
-            self.prevSlot[window] = currentSlot
-            return self.activateAndSync(view, allPresets, presetName, window, True)
+        neighbours = Neighbours(kit, currentSlot, preset, self.kitIndex[kit], self.presets.generation)
+        for order in ['group', 'position']:
+            for vector in [ActionCycle.Value, -ActionCycle.Value]:
+                target = self.findNeighbour(kit, currentSlot, preset, order, vector)
+                if target is None:
+                    continue
+                neighbours.targets[(order, vector)] = target
+                if target[2] is not None:
+                    # Warm icon cache for the floating message
+                    self.icons.icon(target[2])
+        window.neighbours = neighbours
         
-    def activateAndSync(self, view, allPresets: dict, presetName: str, window: int, sameGroup=False):
-        erase = Application.action('erase_action')
-        state = erase.isChecked()
-        size = view.brushSize()
-        opacity = view.paintingOpacity()
-        flow = view.paintingFlow()
-        rotation = view.brushRotation()
-        blending = view.currentBlendingMode()
-
-        view.activateResource(allPresets[presetName])
+    @LATENCY.timed("activateAndSync")
+    def activateAndSync(self, view, presetName: str, window: WindowState, sameGroup=False, resource=None):
+        policy = 0
         if self.sync.active:
-            kit = self.activeKit[window]
-            slot = self.currentSlot[window]
-
-            if self.sync.erase[kit][slot] == 2 or (self.sync.erase[kit][slot] == 1 and sameGroup):
-                if state != erase.isChecked():
-                    erase.trigger()
-            if self.sync.size[kit][slot] == 2 or (self.sync.size[kit][slot] == 1 and sameGroup):
-                view.setBrushSize(size)
-            if self.sync.opacity[kit][slot] == 2 or (self.sync.opacity[kit][slot] == 1 and sameGroup):
-                view.setPaintingOpacity(opacity)
-            if self.sync.flow[kit][slot] == 2 or (self.sync.flow[kit][slot] == 1 and sameGroup):
-                view.setPaintingFlow(flow)
-            if self.sync.rotation[kit][slot] == 2 or (self.sync.rotation[kit][slot] == 1 and sameGroup):
-                view.setBrushRotation(rotation)
-            if self.sync.blending[kit][slot] == 2 or (self.sync.blending[kit][slot] == 1 and sameGroup):
-                view.setCurrentBlendingMode(blending)
+            policy = self.sync.policy(window.kit, window.currentSlot, sameGroup)
+
+        # Each read/write is a call into Krita, only touch settings being synced
+        if policy & SlotSync.ERASE:
+            erase = Application.action('erase_action')
+            state = erase.isChecked()
+        if policy & SlotSync.SIZE:
+            size = view.brushSize()
+        if policy & SlotSync.OPACITY:
+            opacity = view.paintingOpacity()
+        if policy & SlotSync.FLOW:
+            flow = view.paintingFlow()
+        if policy & SlotSync.ROTATION:
+            rotation = view.brushRotation()
+        if policy & SlotSync.BLENDING:
+            blending = view.currentBlendingMode()
+
+        view.activateResource(resource or self.presets.get(presetName))
+
+        # Preset may already match, skip writes that would change nothing
+        if policy & SlotSync.ERASE and state != erase.isChecked():
+            erase.trigger()
+        if policy & SlotSync.SIZE and size != view.brushSize():
+            view.setBrushSize(size)
+        if policy & SlotSync.OPACITY and opacity != view.paintingOpacity():
+            view.setPaintingOpacity(opacity)
+        if policy & SlotSync.FLOW and flow != view.paintingFlow():
+            view.setPaintingFlow(flow)
+        if policy & SlotSync.ROTATION and rotation != view.brushRotation():
+            view.setBrushRotation(rotation)
+        if policy & SlotSync.BLENDING and blending != view.currentBlendingMode():
+            view.setCurrentBlendingMode(blending)
 
         return True
 